@@ -1,12 +1,14 @@
 import os
-import subprocess
 import sys
 from datetime import datetime, timezone
+from pathlib import Path
 
+# Run every stage in this process via the stage-graph runner in src/
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "src"))
+os.chdir(REPO_ROOT)
 
-def run_cmd(cmd, check=True):
-    print(f"\n>>> {cmd}")
-    subprocess.run(cmd, shell=True, check=check)
+from run_daily_pipeline import main as run_pipeline  # noqa: E402
 
 
 def main(date_override=None):
@@ -26,28 +28,13 @@ def main(date_override=None):
             f"Skipping boxscore ingest for 'yesterday' "
             f"(SKIP_YESTERDAY_BACKFILL=1)."
         )
+        ingest_date = None
     else:
+        # Ingest can hang/fail on stats.nba.com; the ingest stage is marked
+        # allow_failure so features, models and projections still run.
         print(f"Running boxscore ingest for: {ingest_date}")
-        try:
-            # This is where ingest_boxscores can hang on stats.nba.com.
-            # We let it fail without killing the rest of the pipeline.
-            run_cmd(f"python src/ingest_boxscores.py {ingest_date}")
-        except subprocess.CalledProcessError as e:
-            print(
-                f"[{datetime.now(timezone.utc)}] [WARN] "
-                f"Boxscore ingest failed with exit code {e.returncode}: {e}. "
-                f"Continuing to feature build and modeling."
-            )
-
-    # These steps should always run so you still get projections
-    print("Building features...")
-    run_cmd("python src/build_features_real.py")
-
-    print("Building model dataset...")
-    run_cmd("python src/build_model_dataset.py")
-
-    print("Running minutes model...")
-    run_cmd("python src/model_minutes.py")
+
+    run_pipeline(ingest_date=ingest_date)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,9 @@
 -- schema.sql
 -- SQLite schema for NBA forecasting project
-
-PRAGMA foreign_keys = ON;
+--
+-- Reference copy of the schema src/migrations.py produces (schema_version 6).
+-- Databases are created and upgraded by the migration runner (db.init_db,
+-- python src/migrations.py); keep this file in step when adding a migration.
 
 -- Teams table
 CREATE TABLE IF NOT EXISTS teams (
@@ -24,37 +26,77 @@ CREATE TABLE IF NOT EXISTS players (
     FOREIGN KEY (team_id) REFERENCES teams(team_id)
 );
 
--- Games table (skeleton for later phases)
+-- Player metadata: position cached from the PlayerIndex endpoint, or
+-- inferred from the player's box stats when it is unavailable (see dvp.py)
+CREATE TABLE IF NOT EXISTS player_meta (
+    player_id   INTEGER PRIMARY KEY,
+    position    TEXT,
+    source      TEXT,
+    updated_at  TEXT
+);
+
+-- Games table; updated_at is set whenever ingestion (re)writes the game's
+-- rows, so incremental builds can find corrected games
 CREATE TABLE IF NOT EXISTS games (
     game_id        TEXT PRIMARY KEY,
     season         TEXT,
     game_date      TEXT,
     home_team_id   INTEGER,
     away_team_id   INTEGER,
-    FOREIGN KEY (home_team_id) REFERENCES teams(team_id),
-    FOREIGN KEY (away_team_id) REFERENCES teams(team_id)
+    updated_at     TEXT
 );
 
--- Boxscores table (skeleton for later phases)
+-- Boxscores table: one row per player per game; ingestion upserts against the key.
+-- game_date and opponent_team_id are copied from games so per-player history
+-- reads need no join. <site>_fp columns are written by scoring.py; sites
+-- registered later get their column added by migrations.migrate().
 CREATE TABLE IF NOT EXISTS boxscores (
-    id               INTEGER PRIMARY KEY AUTOINCREMENT,
-    game_id          TEXT NOT NULL,
-    player_id        INTEGER NOT NULL,
-    team_id          INTEGER NOT NULL,
-    opponent_team_id INTEGER NOT NULL,
-    minutes          REAL,
-    points           INTEGER,
-    rebounds         INTEGER,
-    assists          INTEGER,
-    steals           INTEGER,
-    blocks           INTEGER,
-    turnovers        INTEGER,
-    FOREIGN KEY (game_id)   REFERENCES games(game_id),
-    FOREIGN KEY (player_id) REFERENCES players(player_id),
-    FOREIGN KEY (team_id)   REFERENCES teams(team_id),
-    FOREIGN KEY (opponent_team_id) REFERENCES teams(team_id)
-);
-
--- Simple index examples (can expand later)
-CREATE INDEX IF NOT EXISTS idx_boxscores_player ON boxscores(player_id);
-CREATE INDEX IF NOT EXISTS idx_boxscores_game   ON boxscores(game_id);
+    game_id                TEXT NOT NULL,
+    player_id              INTEGER NOT NULL,
+    team_id                INTEGER NOT NULL,
+    opponent_team_id       INTEGER,
+    game_date              TEXT,
+    minutes                REAL,
+    points                 INTEGER,
+    rebounds               INTEGER,
+    assists                INTEGER,
+    steals                 INTEGER,
+    blocks                 INTEGER,
+    turnovers              INTEGER,
+    field_goals_made       INTEGER,
+    field_goals_attempted  INTEGER,
+    three_points_made      INTEGER,
+    three_points_attempted INTEGER,
+    free_throws_made       INTEGER,
+    free_throws_attempted  INTEGER,
+    dk_fp                  REAL,
+    fd_fp                  REAL,
+    yahoo_fp               REAL,
+    PRIMARY KEY (game_id, player_id)
+);
+
+-- Per-player / per-team history in date order (covering for game lookups)
+CREATE INDEX IF NOT EXISTS idx_boxscores_player_date ON boxscores(player_id, game_date, game_id);
+CREATE INDEX IF NOT EXISTS idx_boxscores_team_date   ON boxscores(team_id, game_date, game_id);
+CREATE INDEX IF NOT EXISTS idx_games_date            ON games(game_date);
+CREATE INDEX IF NOT EXISTS idx_games_updated         ON games(updated_at);
+
+-- Ingestion checkpoints (see ingest_boxscores.py)
+CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+    game_id      TEXT PRIMARY KEY,
+    game_date    TEXT,
+    completed_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS ingest_checkpoint_dates (
+    game_date    TEXT PRIMARY KEY,
+    n_games      INTEGER,
+    completed_at TEXT
+);
+
+-- Applied migrations
+CREATE TABLE IF NOT EXISTS schema_version (
+    version     INTEGER PRIMARY KEY,
+    description TEXT,
+    applied_at  TEXT
+);
@@ -0,0 +1,182 @@
+"""
+api_cache.py
+
+On-disk cache for nba_api responses.
+
+Each response is stored as gzip-compressed JSON under data/raw/api_cache/,
+keyed by endpoint name + request params. Entries carry their own TTL
+(None = keep forever, used for final boxscores). The cache is kept under a
+size cap by evicting least-recently-used files (access time = file mtime).
+Writes add to a running size total, so the directory is only scanned once
+per process and then whenever the total passes the cap; eviction goes down
+to EVICT_TO_FRACTION of the cap so those scans stay rare.
+
+Set NBA_API_OFFLINE=1 (or api_cache.OFFLINE = True) to replay only from the
+cache: expired entries are still served and a miss raises OfflineCacheMiss
+instead of touching the network.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+CACHE_DIR = Path(os.getenv("NBA_API_CACHE_DIR", BASE_DIR / "data" / "raw" / "api_cache"))
+
+MAX_CACHE_BYTES = int(float(os.getenv("NBA_API_CACHE_MAX_MB", "512")) * 1024 * 1024)
+EVICT_TO_FRACTION = 0.9
+OFFLINE = os.getenv("NBA_API_OFFLINE", "0") == "1"
+
+FOREVER = None
+
+_evict_lock = threading.Lock()
+_cache_bytes = None     # running size of CACHE_DIR; None until first scanned
+
+
+class OfflineCacheMiss(RuntimeError):
+    """Raised in offline mode when a request has no cached response."""
+
+
+class CachedResponse:
+    """Stands in for an nba_api endpoint object (only get_data_frames is used)."""
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def get_data_frames(self):
+        return [
+            pd.read_json(StringIO(f), orient="split", dtype=False, convert_dates=False)
+            for f in self.frames
+        ]
+
+
+# ---------------------------
+# Keys and paths
+# ---------------------------
+
+def cache_path(endpoint: str, params: dict) -> Path:
+    key = json.dumps({"endpoint": endpoint, "params": params}, sort_keys=True, default=str)
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return CACHE_DIR / endpoint / f"{digest}.json.gz"
+
+
+# ---------------------------
+# Read / write
+# ---------------------------
+
+def get(endpoint: str, params: dict):
+    """Return a CachedResponse, or None on a miss or expired entry."""
+    path = cache_path(endpoint, params)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (FileNotFoundError, OSError, ValueError):
+        return None
+
+    ttl = entry.get("ttl")
+    if not OFFLINE and ttl is not None and time.time() - entry["created"] > ttl:
+        return None
+
+    # Touch for LRU ordering
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+    return CachedResponse(entry["frames"])
+
+
+def put(endpoint: str, params: dict, frames, ttl=FOREVER) -> CachedResponse:
+    """Store data frames for a request and return them as a CachedResponse."""
+    path = cache_path(endpoint, params)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    entry = {
+        "endpoint": endpoint,
+        "params": params,
+        "created": time.time(),
+        "ttl": ttl,
+        "frames": [df.to_json(orient="split", index=False) for df in frames],
+    }
+
+    # Write-then-rename so concurrent readers never see a partial file
+    tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(entry, f, default=str)
+    size = tmp.stat().st_size
+    try:
+        replaced = path.stat().st_size
+    except FileNotFoundError:
+        replaced = 0
+    os.replace(tmp, path)
+
+    _track(size - replaced)
+    return CachedResponse(entry["frames"])
+
+
+def _track(delta: int) -> None:
+    """Add a write to the running cache size; evict once it passes the cap."""
+    global _cache_bytes
+    with _evict_lock:
+        if _cache_bytes is not None:
+            _cache_bytes += delta
+        over = _cache_bytes is None or _cache_bytes > MAX_CACHE_BYTES
+    if over:
+        evict(int(MAX_CACHE_BYTES * EVICT_TO_FRACTION))
+
+
+def evict(max_bytes: int | None = None) -> int:
+    """Delete least-recently-used entries until the cache fits max_bytes."""
+    global _cache_bytes
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+
+    with _evict_lock:
+        files = []
+        for path in CACHE_DIR.glob("*/*.json.gz"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        _cache_bytes = total
+
+    return removed
+
+
+# ---------------------------
+# Call wrapper
+# ---------------------------
+
+def cached_call(endpoint: str, params: dict, fetch, ttl=FOREVER) -> CachedResponse:
+    """
+    Serve a request from the cache, or call fetch() (which must return an
+    nba_api endpoint object) and store its data frames.
+    """
+    hit = get(endpoint, params)
+    if hit is not None:
+        return hit
+
+    if OFFLINE:
+        raise OfflineCacheMiss(f"No cached {endpoint} response for {params}")
+
+    response = fetch()
+    return put(endpoint, params, response.get_data_frames(), ttl=ttl)
@@ -0,0 +1,214 @@
+# src/backtest.py
+
+"""
+backtest.py
+
+Walk-forward backtest: for every historical slate date, project with
+models trained only on games before that date, and report MAE / RMSE per
+target over time.
+
+- The model dataset is turned into one date-sorted float32 feature matrix
+  plus target matrix, cached as .npy files under outputs/backtest_cache/
+  (keyed by the dataset file and feature lists) and memory-mapped by every
+  worker, so folds never re-read or copy the features.
+- Because rows are date-sorted, each fold's training set is a prefix and
+  its test slates a contiguous slice of those arrays.
+- Models are refit every --retrain-every days (like the weekly full
+  retrain in retrain.py) and folds run in a process pool.
+
+Usage:
+    python src/backtest.py --start 2024-11-01 --end 2025-04-13
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+import model_minutes
+import model_stats
+from dataset_store import OUTPUT_DIR, find_dataset, load_dataset
+
+CACHE_DIR = OUTPUT_DIR / "backtest_cache"
+RESULTS_DIR = OUTPUT_DIR / "backtest"
+
+RETRAIN_EVERY_DAYS = 7
+MIN_TRAIN_DAYS = 30
+WORKERS = int(os.getenv("NBA_BACKTEST_WORKERS", os.cpu_count() or 1))
+
+TARGETS = ["minutes"] + [t for t, _ in model_stats.TARGETS]
+MINUTES_IDX = [model_stats.FEATURE_COLS.index(c) for c in model_minutes.FEATURE_COLS]
+
+
+# ---------------------------
+# Cached matrices
+# ---------------------------
+
+def cache_key() -> str:
+    path = find_dataset("model_dataset")
+    if path is None:
+        raise FileNotFoundError("No model_dataset; run build_model_dataset.py first")
+    stat = path.stat()
+    key = json.dumps([str(path), stat.st_mtime_ns, stat.st_size, model_stats.FEATURE_COLS, TARGETS])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def build_cache() -> Path:
+    """Write (or reuse) X.npy, Y.npy, day.npy for the current model dataset."""
+    out = CACHE_DIR / cache_key()
+    if (out / "day.npy").exists():
+        return out
+
+    print("Building backtest feature cache...")
+    df = load_dataset("model_dataset", columns=["game_date"] + model_stats.FEATURE_COLS + TARGETS)
+    df = df.dropna().sort_values("game_date", kind="stable")
+
+    out.mkdir(parents=True, exist_ok=True)
+    np.save(out / "X.npy", np.ascontiguousarray(df[model_stats.FEATURE_COLS].to_numpy(dtype=np.float32)))
+    np.save(out / "Y.npy", df[TARGETS].to_numpy(dtype=np.float64))
+    # day.npy last: its presence marks a complete cache entry
+    np.save(out / "day.npy", df["game_date"].to_numpy(dtype="datetime64[D]"))
+    return out
+
+
+def load_cache(path: Path):
+    return (
+        np.load(path / "X.npy", mmap_mode="r"),
+        np.load(path / "Y.npy", mmap_mode="r"),
+        np.load(path / "day.npy", mmap_mode="r"),
+    )
+
+
+# ---------------------------
+# Folds
+# ---------------------------
+
+def make_folds(days: np.ndarray, start=None, end=None,
+               retrain_every: int = RETRAIN_EVERY_DAYS, min_train_days: int = MIN_TRAIN_DAYS):
+    """
+    [(lo, hi)] row offsets into the date-sorted arrays: train on rows
+    [0, lo), project the slates in rows [lo, hi).
+    """
+    slates = np.unique(days)
+    first = slates[0] + np.timedelta64(min_train_days, "D")
+    lo = max(first, np.datetime64(start, "D")) if start else first
+    slates = slates[slates >= lo]
+    if end:
+        slates = slates[slates <= np.datetime64(end, "D")]
+
+    folds = []
+    i = 0
+    while i < len(slates):
+        block_end = slates[i] + np.timedelta64(retrain_every, "D")
+        j = np.searchsorted(slates, block_end)
+        begin = int(np.searchsorted(days, slates[i], side="left"))
+        stop = int(np.searchsorted(days, slates[j - 1], side="right"))
+        folds.append((begin, stop))
+        i = j
+    return folds
+
+
+def run_fold(cache_path: Path, fold, n_trees=None):
+    """Fit on the fold's history and predict its slates; returns (days, preds, actual)."""
+    X, Y, days = load_cache(cache_path)
+    lo, hi = fold
+    X_train, X_test = X[:lo], X[lo:hi]
+
+    preds = np.empty((hi - lo, len(TARGETS)))
+
+    minutes = LinearRegression().fit(X_train[:, MINUTES_IDX], Y[:lo, 0])
+    preds[:, 0] = minutes.predict(X_test[:, MINUTES_IDX])
+
+    for k in range(1, len(TARGETS)):
+        forest = model_stats.new_forest(n_jobs=1)
+        if n_trees:
+            forest.set_params(n_estimators=n_trees)
+        forest.fit(X_train, Y[:lo, k])
+        preds[:, k] = forest.predict(X_test)
+
+    return np.asarray(days[lo:hi]), preds, np.asarray(Y[lo:hi])
+
+
+# ---------------------------
+# Metrics
+# ---------------------------
+
+def daily_metrics(days, preds, actual) -> pd.DataFrame:
+    err = preds - actual
+    df = pd.DataFrame({"game_date": pd.to_datetime(days)})
+    for k, target in enumerate(TARGETS):
+        df[f"{target}_abs"] = np.abs(err[:, k])
+        df[f"{target}_sq"] = err[:, k] ** 2
+
+    grouped = df.groupby("game_date")
+    out = pd.DataFrame({"n": grouped.size()})
+    for target in TARGETS:
+        out[f"{target}_mae"] = grouped[f"{target}_abs"].mean()
+        out[f"{target}_rmse"] = np.sqrt(grouped[f"{target}_sq"].mean())
+    return out.reset_index()
+
+
+def summarize(preds, actual) -> pd.DataFrame:
+    err = preds - actual
+    return pd.DataFrame({
+        "mae": np.abs(err).mean(axis=0),
+        "rmse": np.sqrt((err ** 2).mean(axis=0)),
+    }, index=TARGETS)
+
+
+# ---------------------------
+# Entry point
+# ---------------------------
+
+def backtest(start=None, end=None, retrain_every: int = RETRAIN_EVERY_DAYS,
+             min_train_days: int = MIN_TRAIN_DAYS, workers: int = WORKERS, n_trees=None):
+    cache_path = build_cache()
+    _, _, days = load_cache(cache_path)
+
+    folds = make_folds(np.asarray(days), start, end, retrain_every, min_train_days)
+    if not folds:
+        raise ValueError("No slate dates to backtest in the requested range")
+    print(f"Backtesting {len(folds)} folds with {workers} workers...")
+
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(run_fold, [cache_path] * len(folds), folds, [n_trees] * len(folds)))
+
+    fold_days = np.concatenate([r[0] for r in results])
+    preds = np.concatenate([r[1] for r in results])
+    actual = np.concatenate([r[2] for r in results])
+
+    daily = daily_metrics(fold_days, preds, actual)
+    summary = summarize(preds, actual)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    first, last = str(fold_days.min()), str(fold_days.max())
+    out_path = RESULTS_DIR / f"backtest_{first}_{last}.csv"
+    daily.to_csv(out_path, index=False)
+
+    print(f"\nWalk-forward backtest {first} → {last} ({len(preds)} player-games)")
+    print(summary.round(3).to_string())
+    print(f"Saved per-date metrics to {out_path}")
+    return daily, summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the projection models.")
+    parser.add_argument("--start", help="First slate date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last slate date (YYYY-MM-DD)")
+    parser.add_argument("--retrain-every", type=int, default=RETRAIN_EVERY_DAYS,
+                        help="Days between model refits")
+    parser.add_argument("--min-train-days", type=int, default=MIN_TRAIN_DAYS,
+                        help="History required before the first projected slate")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Folds run in parallel")
+    parser.add_argument("--trees", type=int, help="Override forest size (faster, less faithful)")
+    args = parser.parse_args()
+
+    backtest(args.start, args.end, args.retrain_every, args.min_train_days,
+             args.workers, args.trees)
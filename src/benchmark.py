@@ -0,0 +1,237 @@
+# src/benchmark.py
+
+"""
+benchmark.py
+
+Times and memory-profiles every pipeline stage on synthetic data
+(synthetic.py), at one or more scales, without touching stats.nba.com.
+
+Each scale runs in its own subprocess with the DB, datasets, models and
+projections redirected to a scratch directory (NBA_DB_PATH,
+NBA_OUTPUT_DIR, NBA_MODELS_DIR, NBA_PROJECTIONS_DIR) and the API cache in
+offline mode, so runs are isolated and peak RSS is per scale. Peak RSS per
+stage is sampled by a background thread.
+
+Results go to outputs/benchmarks/<timestamp>_<commit>.json; pass
+--compare OLD.json to print the change against an earlier run.
+
+Usage:
+    python src/benchmark.py --seasons 1 5 20
+    python src/benchmark.py --seasons 1 --compare outputs/benchmarks/old.json
+"""
+
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+RESULTS_DIR = BASE_DIR / "outputs" / "benchmarks"
+WORK_DIR = RESULTS_DIR / "work"
+
+DEFAULT_SCALES = [1, 5, 20]
+SAMPLE_SECONDS = 0.02
+
+
+# ---------------------------
+# Profiling
+# ---------------------------
+
+class StageProfiler:
+    """Wall time, RSS change and sampled peak RSS for named stages."""
+
+    def __init__(self):
+        self.results = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        from pipeline_dag import current_rss_mb
+
+        before = current_rss_mb()
+        peak = [before]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(SAMPLE_SECONDS):
+                peak[0] = max(peak[0], current_rss_mb())
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        entry = {}
+        try:
+            yield entry
+            entry["status"] = "ok"
+        except Exception as e:
+            entry.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+        finally:
+            seconds = time.perf_counter() - start
+            done.set()
+            sampler.join()
+            after = current_rss_mb()
+            entry.update({
+                "seconds": round(seconds, 3),
+                "rss_delta_mb": round(after - before, 1),
+                "peak_rss_mb": round(max(peak[0], after), 1),
+            })
+            self.results[name] = entry
+            print(f"  {name:<20} {entry['status']:<6} {seconds:8.2f}s  peak {entry['peak_rss_mb']:.0f} MB",
+                  flush=True)
+
+    def ok(self, *names) -> bool:
+        return all(self.results.get(n, {}).get("status") == "ok" for n in names)
+
+
+# ---------------------------
+# One scale (runs in a subprocess)
+# ---------------------------
+
+def run_scale(seasons: int, seed: int = 0) -> dict:
+    """Run every stage once against the DB at NBA_DB_PATH."""
+    import db
+    import synthetic
+
+    prof = StageProfiler()
+    out = {"seasons": seasons}
+
+    with prof.stage("generate") as info:
+        info.update(synthetic.generate(db.DB_PATH, seasons, seed=seed))
+
+    import build_features_real
+    import build_model_dataset
+    import model_minutes
+    import model_stats
+    import projection_engine as pe
+    from dataset_store import load_dataset
+
+    full = None
+    with prof.stage("build_features") as info:
+        info["rows"] = build_features_real.build_features()
+
+    if prof.ok("build_features"):
+        with prof.stage("build_model_dataset") as info:
+            full, _, _ = build_model_dataset.build(load_dataset("features"))
+            info["rows"] = len(full)
+
+    if prof.ok("build_model_dataset"):
+        with prof.stage("train_minutes"):
+            model_minutes.train(full)
+        with prof.stage("train_stats"):
+            model_stats.train_all(full)
+
+    if prof.ok("train_minutes", "train_stats"):
+        last_date = str(full["game_date"].max().date())
+        with prof.stage("projection") as info:
+            # Cold start: load state + models from disk, as a fresh run would
+            df = pe.apply_slate(pe.load_latest_features(), last_date)
+            info["rows"] = len(pe.project(df, pe.load_models()))
+
+    out["stages"] = prof.results
+    return out
+
+
+# ---------------------------
+# Driver
+# ---------------------------
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def scale_env(workdir: Path) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "NBA_DB_PATH": str(workdir / "nba.db"),
+        "NBA_OUTPUT_DIR": str(workdir / "outputs"),
+        "NBA_MODELS_DIR": str(workdir / "models"),
+        "NBA_PROJECTIONS_DIR": str(workdir / "projections"),
+        "NBA_API_CACHE_DIR": str(workdir / "api_cache"),
+        "NBA_API_OFFLINE": "1",
+    })
+    return env
+
+
+def run(scales, seed: int = 0, keep: bool = False) -> Path:
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "scales": {},
+    }
+
+    for seasons in scales:
+        workdir = WORK_DIR / f"seasons_{seasons}"
+        shutil.rmtree(workdir, ignore_errors=True)
+        workdir.mkdir(parents=True)
+        result_path = workdir / "result.json"
+
+        print(f"\n=== {seasons} season(s) ===", flush=True)
+        subprocess.run(
+            [sys.executable, __file__, "--worker", "--seasons", str(seasons),
+             "--seed", str(seed), "--result", str(result_path)],
+            env=scale_env(workdir), check=True,
+        )
+        report["scales"][str(seasons)] = json.loads(result_path.read_text())
+
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = RESULTS_DIR / f"{datetime.now():%Y%m%d_%H%M%S}_{commit}.json"
+    out_path.write_text(json.dumps(report, indent=2))
+    print(f"\nSaved benchmark results to {out_path}")
+    return out_path
+
+
+def compare(new_path, old_path) -> None:
+    new = json.loads(Path(new_path).read_text())
+    old = json.loads(Path(old_path).read_text())
+
+    print(f"\n{'scale':<6} {'stage':<20} {'old s':>9} {'new s':>9} {'ratio':>7} "
+          f"{'old MB':>8} {'new MB':>8}")
+    for scale, result in new["scales"].items():
+        before = old["scales"].get(scale, {}).get("stages", {})
+        for stage, cur in result["stages"].items():
+            prev = before.get(stage)
+            if not prev:
+                continue
+            ratio = cur["seconds"] / prev["seconds"] if prev["seconds"] else float("nan")
+            print(f"{scale:<6} {stage:<20} {prev['seconds']:9.2f} {cur['seconds']:9.2f} {ratio:7.2f} "
+                  f"{prev['peak_rss_mb']:8.0f} {cur['peak_rss_mb']:8.0f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic seasons.")
+    parser.add_argument("--seasons", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="Scales to run, in seasons of data")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch DB/outputs")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_scale(args.seasons[0], seed=args.seed)
+        Path(args.result).write_text(json.dumps(result, indent=2))
+    else:
+        path = run(args.seasons, seed=args.seed, keep=args.keep)
+        if args.compare:
+            compare(path, args.compare)
@@ -16,6 +16,8 @@ import pandas as pd
 import numpy as np
 
 from db import get_connection, init_db
+import frame_dtypes
+import scoring
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 PROCESSED_DIR = BASE_DIR / "data" / "processed"
@@ -26,16 +28,9 @@ PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 # Fantasy scoring
 # ---------------------------
 
-def compute_fantasy_points(df: pd.DataFrame) -> pd.Series:
-    """Compute fantasy points using standard scoring."""
-    return (
-        df["points"] * 1 +
-        df["rebounds"] * 1.2 +
-        df["assists"] * 1.5 +
-        df["steals"] * 3 +
-        df["blocks"] * 3 -
-        df["turnovers"] * 1
-    )
+def compute_fantasy_points(df: pd.DataFrame, site: str = scoring.DEFAULT_SITE) -> pd.Series:
+    """Compute fantasy points with a site's rules from scoring.py."""
+    return scoring.fantasy_scores(df, [site])[scoring.score_column(site)]
 
 
 # ---------------------------
@@ -79,6 +74,9 @@ def compute_dvp(df: pd.DataFrame) -> pd.DataFrame:
     Simplified version:
         For each defense team + player position:
             mean fantasy points allowed
+
+    The real pipeline keeps a rolling, incrementally updated version in
+    SQLite instead (dvp.py).
     """
     dvp = (
         df.groupby(["opponent_team_id", "position"])["fantasy_points"]
@@ -120,7 +118,7 @@ def build_features():
         "turnovers": [3, 1, 2, 2, 1]
     }
 
-    df = pd.DataFrame(data)
+    df = frame_dtypes.compact(pd.DataFrame(data))
 
     print("Computing fantasy points...")
     df["fantasy_points"] = compute_fantasy_points(df)
@@ -5,149 +5,703 @@ Build machine-learning features from the SQLite database.
 Loads:
     - games
     - boxscores
+    - dvp_games (defense vs position, kept up to date by dvp.py)
+
+Rolling features are computed inside SQLite with window functions and
+streamed back in chunks, so the raw history never sits in pandas. A full
+build splits players into player_id % n partitions, sized so that the
+partitions in flight fit NBA_FEATURE_MEMORY_MB, computes them in a
+process pool (NBA_FEATURE_WORKERS) and writes each one out as it finishes.
 
 Outputs:
-    - /outputs/features.csv
+    - "features" dataset (outputs/features.parquet, see dataset_store.py)
+    - player_features table
+    - player_state table (each player's latest feature row, for projection)
 """
 
+import math
+import os
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 from pathlib import Path
 from db import get_connection, init_db
-from math import radians, cos, sin, asin, sqrt
+from migrations import migrate
+import dvp
+import frame_dtypes
+import scoring
+from dataset_store import OUTPUT_DIR, DatasetWriter, append_dataset, dataset_exists
 
 # ---------------------------------------------------------
 # Correct Repo Root
 # ---------------------------------------------------------
 BASE_DIR = Path(__file__).resolve().parents[1]
-OUTPUT_DIR = BASE_DIR / "outputs"
-OUTPUT_DIR.mkdir(exist_ok=True, parents=True)
 
-FEATURE_OUTPUT = OUTPUT_DIR / "features.csv"
+FEATURE_DATASET = "features"
 
 # ---------------------------------------------------------
 # Team coordinates (approx arenas)
 # ---------------------------------------------------------
-TEAM_LOCATIONS = {
-    1610612737: (33.7573, -84.3963),
-    1610612738: (42.3663, -71.0622),
-    1610612739: (41.4965, -81.6882),
-    1610612740: (29.9490, -90.0821),
-    1610612741: (41.8807, -87.6742),
-    1610612742: (32.7905, -96.8104),
-    1610612743: (39.7487, -104.9955),
-    1610612744: (37.7680, -122.3877),
-    1610612745: (29.7508, -95.3621),
-    1610612746: (38.8981, -77.0209),
-    1610612747: (34.0430, -118.2673),
-    1610612748: (25.7814, -80.1870),
-    1610612749: (43.0436, -87.9090),
-    1610612750: (44.9795, -93.2760),
-    1610612751: (40.6827, -73.9757),
-    1610612752: (40.7505, -73.9934),
-    1610612753: (28.5392, -81.3839),
-    1610612754: (39.7684, -86.1581),
-    1610612755: (39.9012, -75.1720),
-    1610612756: (33.4457, -112.0712),
-    1610612757: (45.5316, -122.6668),
-    1610612758: (38.5802, -121.4997),
-    1610612759: (35.4634, -97.5151),
-    1610612760: (43.6435, -79.3791),
-    1610612762: (35.1382, -90.0506),
-    1610612764: (38.8981, -77.0209),
-    1610612765: (42.3411, -83.0553),
-    1610612766: (35.2271, -80.8431),
-}
+TEAM_LOCATIONS_PATH = BASE_DIR / "data" / "static" / "team_locations.csv"
+ARENA_DISTANCE_CACHE = OUTPUT_DIR / "arena_distances.npz"
+
+
+def load_team_locations():
+    """Team ids plus arena lat/lon as parallel NumPy arrays."""
+    loc = pd.read_csv(TEAM_LOCATIONS_PATH)
+    return (
+        loc["team_id"].to_numpy(dtype=np.int64),
+        loc["lat"].to_numpy(dtype=np.float64),
+        loc["lon"].to_numpy(dtype=np.float64),
+    )
 
 # ---------------------------------------------------------
 # Travel calculation
 # ---------------------------------------------------------
 def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; works elementwise on arrays."""
     R = 6371  # km
-    d_lat = radians(lat2 - lat1)
-    d_lon = radians(lon2 - lon1)
-    a = sin(d_lat/2)**2 + cos(radians(lat1))*cos(radians(lat2))*sin(d_lon/2)**2
-    return 2 * R * asin(sqrt(a))
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    d_lat = lat2 - lat1
+    d_lon = lon2 - lon1
+    a = np.sin(d_lat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(d_lon / 2) ** 2
+    return 2 * R * np.arcsin(np.sqrt(a))
+
+
+def arena_distance_matrix():
+    """
+    (team_ids, 30x30 km matrix) between every pair of arenas.
+    Cached in the output directory (NBA_OUTPUT_DIR) and rebuilt when the
+    CSV changes.
+    """
+    if (
+        ARENA_DISTANCE_CACHE.exists()
+        and ARENA_DISTANCE_CACHE.stat().st_mtime >= TEAM_LOCATIONS_PATH.stat().st_mtime
+    ):
+        cached = np.load(ARENA_DISTANCE_CACHE)
+        return cached["team_ids"], cached["distances"]
+
+    team_ids, lat, lon = load_team_locations()
+    distances = haversine(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+
+    ARENA_DISTANCE_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(ARENA_DISTANCE_CACHE, team_ids=team_ids, distances=distances)
+    return team_ids, distances
+
+
+def team_schedule(games):
+    """
+    One row per (game_id, team_id) with rest and travel since that team's
+    previous game. Every game is played at the home team's arena, so travel
+    is the distance from the previous venue to this one.
+    """
+    home = games[["game_id", "game_date", "home_team_id"]].assign(team_id=games["home_team_id"])
+    away = games[["game_id", "game_date", "home_team_id"]].assign(team_id=games["away_team_id"])
+    sched = pd.concat([home, away], ignore_index=True).rename(columns={"home_team_id": "venue_team_id"})
+    sched = sched.sort_values(["team_id", "game_date"], kind="mergesort").reset_index(drop=True)
+
+    team = sched["team_id"].to_numpy()
+    first = np.r_[True, team[1:] != team[:-1]]
+
+    venue = sched["venue_team_id"].to_numpy()
+    prev_venue = np.r_[venue[:1], venue[:-1]]
+
+    dates = sched["game_date"].to_numpy()
+    prev_date = np.r_[dates[:1], dates[:-1]]
+    sched["prev_game_date"] = pd.Series(prev_date).where(~first)
+    sched["days_rest"] = (sched["game_date"] - sched["prev_game_date"]).dt.days
+
+    # Arena lookup: team id -> row of the distance matrix (-1 = unknown)
+    team_ids, distances = arena_distance_matrix()
+    order = np.argsort(team_ids)
+
+    def arena_index(ids):
+        pos = np.searchsorted(team_ids, ids, sorter=order).clip(0, len(team_ids) - 1)
+        idx = order[pos]
+        return np.where(team_ids[idx] == ids, idx, -1)
+
+    cur_idx = arena_index(venue)
+    prev_idx = arena_index(prev_venue)
+    known = (cur_idx >= 0) & (prev_idx >= 0) & ~first
+    travel = np.zeros(len(sched))
+    travel[known] = distances[prev_idx[known], cur_idx[known]]
+    sched["travel_km"] = travel
+
+    return sched[["game_id", "team_id", "prev_game_date", "days_rest", "travel_km"]]
+
+# ---------------------------------------------------------
+# Rolling feature definitions (each one SQL window, see feature_query)
+# ---------------------------------------------------------
+def rolling_specs(columns: dict, windows, stats=("mean",)):
+    """
+    Expand {input column: output prefix} x windows x stats into
+    (output column, input column, window, "mean" | "std") specs named
+    like "<prefix>_last_<k>" (mean) and "<prefix>_std_<k>" (std).
+    """
+    specs = []
+    for col, prefix in columns.items():
+        for k in windows:
+            for stat in stats:
+                name = f"{prefix}_last_{k}" if stat == "mean" else f"{prefix}_{stat}_{k}"
+                specs.append((name, col, k, stat))
+    return specs
+
+
+ROLLING_FEATURES = (
+    rolling_specs({"minutes": "minutes"}, windows=(5, 10, 20))
+    + rolling_specs({"fantasy_points": "fppg"}, windows=(5, 10, 20), stats=("mean", "std"))
+    + rolling_specs(
+        {"points": "points", "rebounds": "rebounds", "assists": "assists"}, windows=(10,)
+    )
+    + [("usage_proxy", "usage", 10, "mean")]
+)
+
+# Games of history an incremental recompute reads before each player's
+# first recomputed game: enough to fill the longest window
+HISTORY_GAMES = max(k for _, _, k, _ in ROLLING_FEATURES) + 1
 
 # ---------------------------------------------------------
-# Minute parser
+# Incremental state
 # ---------------------------------------------------------
-def parse_minutes(m):
-    """Convert 'mm:ss' to float minutes."""
-    if m is None or pd.isna(m):
-        return 0
-    if isinstance(m, (int, float)):
-        return float(m)
-    try:
-        mins, secs = map(int, str(m).split(":"))
-        return mins + secs / 60
-    except:
-        return 0
+FEATURE_TABLE = "player_features"
+STATE_TABLE = "feature_state"
+PLAYER_STATE_TABLE = "player_state"
+
+
+def init_feature_tables(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            key   TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """)
+
+
+def get_state(conn, key):
+    init_feature_tables(conn)
+    row = conn.execute(f"SELECT value FROM {STATE_TABLE} WHERE key = ?;", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_state(conn, key, value):
+    init_feature_tables(conn)
+    conn.execute(f"""
+        INSERT INTO {STATE_TABLE} (key, value) VALUES (?, ?)
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value;
+    """, (key, value))
+
+
+def get_high_water_mark(conn):
+    return get_state(conn, "last_game_date")
+
+
+def set_high_water_mark(conn, game_date):
+    set_state(conn, "last_game_date", game_date)
+
+
+def games_updated_marker(conn):
+    """Latest games.updated_at (ingestion's change marker), or None."""
+    return conn.execute("SELECT MAX(updated_at) FROM games;").fetchone()[0]
+
+
+def write_player_state(conn, df, replace=False):
+    """
+    Materialize each player's most recent feature row, keyed by player_id.
+    With replace=False, players in df overwrite their stored row and
+    everyone else is left as-is.
+    """
+    latest = df.sort_values(["player_id", "game_date"]).drop_duplicates("player_id", keep="last")
+
+    if replace:
+        latest.to_sql(PLAYER_STATE_TABLE, conn, if_exists="replace", index=False)
+        conn.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{PLAYER_STATE_TABLE}_player "
+            f"ON {PLAYER_STATE_TABLE}(player_id);"
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{PLAYER_STATE_TABLE}_date "
+            f"ON {PLAYER_STATE_TABLE}(game_date);"
+        )
+        return
+
+    staging = f"{PLAYER_STATE_TABLE}_staging"
+    latest.to_sql(staging, conn, if_exists="replace", index=False)
+    cols = ", ".join(f'"{c}"' for c in latest.columns)
+    conn.execute(
+        f"INSERT OR REPLACE INTO {PLAYER_STATE_TABLE} ({cols}) SELECT {cols} FROM {staging};"
+    )
+    conn.execute(f"DROP TABLE {staging};")
+
+# ---------------------------------------------------------
+# SQL feature extraction
+# ---------------------------------------------------------
+# Feature rows are produced by SQLite: every ROLLING_FEATURES window is an
+# AVG/SUM ... OVER (PARTITION BY player_id ORDER BY game_date ROWS k-1
+# PRECEDING), read off the (player_id, game_date) index, and only rows in
+# the requested date range come back, CHUNK_ROWS at a time.
+CHUNK_ROWS = 100_000
+
+# "mm:ss" strings from older ingests, else the stored decimal minutes
+MINUTES_SQL = """CASE
+        WHEN typeof(b.minutes) = 'text' AND instr(b.minutes, ':') > 0
+            THEN CAST(substr(b.minutes, 1, instr(b.minutes, ':') - 1) AS REAL)
+                 + CAST(substr(b.minutes, instr(b.minutes, ':') + 1) AS REAL) / 60
+        ELSE COALESCE(CAST(b.minutes AS REAL), 0)
+    END"""
+
+# Columns computed in the query rather than passed through from boxscores
+DERIVED_COLUMNS = ["game_date", "minutes", "opponent_team_id", "fantasy_points", "usage", "dvp_last_20"]
+
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table});")]
+
 
+def column_dtypes(conn):
+    """
+    Compact dtype per passed-through column that frame_dtypes does not
+    name, from the declared SQL types, so every partition has the same
+    schema whatever NULLs it happens to hold: INTEGER ids -> int32, other
+    numbers -> float32, text -> object.
+    """
+    dtypes = {}
+    for table in ("boxscores", "games"):
+        for row in conn.execute(f"PRAGMA table_info({table});"):
+            name, decl = row[1], row[2].upper()
+            if "INT" in decl:
+                dtypes[name] = "int32" if name.endswith("_id") else "float32"
+            elif any(t in decl for t in ("REAL", "FLOA", "DOUB", "NUM")):
+                dtypes[name] = "float32"
+            elif "TEXT" in decl or "CHAR" in decl:
+                dtypes[name] = "object"
+    dtypes.update({"minutes": "float32", "fantasy_points": "float32", "usage": "float32",
+                   "dvp_last_20": "float32"})
+    dtypes.pop("game_date", None)
+    return dtypes
+
+
+def window_aggregates(specs):
+    """
+    Running SUM / COUNT (and SUM of squares for std) per distinct
+    (column, window), so specs sharing a window share its aggregates.
+    """
+    aggs = {}
+    for _, col, k, stat in specs:
+        aggs[f"s_{col}_{k}"] = f"SUM({col}) OVER w{k}"
+        aggs[f"n_{col}_{k}"] = f"COUNT({col}) OVER w{k}"
+        if stat == "std":
+            aggs[f"q_{col}_{k}"] = f"SUM({col} * {col}) OVER w{k}"
+    return aggs
+
+
+def rolling_sql(name, col, k, stat):
+    """
+    One rolling spec from its window aggregates. Like pandas rolling(k), a
+    value is only produced once the window holds k non-missing rows;
+    "std" returns the variance (the square root is taken in pandas).
+    """
+    s, n, q = f"s_{col}_{k}", f"n_{col}_{k}", f"q_{col}_{k}"
+    if stat == "mean":
+        return f"CASE WHEN {n} = {k} THEN {s} * 1.0 / {k} END AS {name}"
+    if stat == "std":
+        if k < 2:
+            return f"NULL AS {name}"
+        return f"CASE WHEN {n} = {k} THEN ({q} - {s} * 1.0 * {s} / {k}) / {k - 1} END AS {name}"
+    raise ValueError(f"Unknown rolling stat: {stat}")
+
+
+def feature_query(conn, affected_only=False, bucketed=False):
+    """
+    SELECT returning finished feature rows (minus rest/travel) for
+    game_date in (:start, :end]. With affected_only, only the players in
+    temp.feature_affected are read (see mark_affected) and rows come back
+    from each one's recompute_from date on; their last HISTORY_GAMES
+    earlier games feed the windows, so the cost does not grow with history.
+    With bucketed, only players with player_id % :buckets = :bucket.
+    """
+    box_cols = table_columns(conn, "boxscores")
+    game_cols = [
+        c for c in table_columns(conn, "games") if c not in ("game_id", "game_date", "updated_at")
+    ]
+    passthrough = [c for c in box_cols if c not in DERIVED_COLUMNS]
+
+    fp_col = scoring.score_column(scoring.DEFAULT_SITE)
+    fantasy_points = scoring.score_sql(scoring.DEFAULT_SITE, box_cols, alias="b")
+    if fp_col in box_cols:
+        fantasy_points = f"COALESCE(b.{fp_col}, {fantasy_points})"
+
+    # Possessions used (shots + trips to the line + turnovers)
+    if {"field_goals_attempted", "free_throws_attempted"} <= set(box_cols):
+        usage = "b.field_goals_attempted + 0.44 * b.free_throws_attempted + b.turnovers"
+    else:
+        usage = "NULL"
+
+    conditions = []
+    source = "boxscores b"
+    if affected_only:
+        # Only each player's last HISTORY_GAMES games before recompute_from;
+        # CROSS JOIN keeps the affected players as the outer loop
+        source = (
+            "temp.feature_affected a CROSS JOIN boxscores b "
+            "ON b.player_id = a.player_id AND b.game_date >= a.history_from"
+        )
+    if bucketed:
+        conditions.append("b.player_id % :buckets = :bucket")
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+
+    opponent = "CASE WHEN b.team_id = g.home_team_id THEN g.away_team_id ELSE g.home_team_id END"
+
+    base_cols = passthrough + ["game_date"] + game_cols + DERIVED_COLUMNS[1:]
+    select = ",\n            ".join(
+        [f"b.{c}" for c in passthrough]
+        + ["b.game_date"]
+        + [f"g.{c}" for c in game_cols]
+        + [
+            f"{MINUTES_SQL} AS minutes",
+            f"{opponent} AS opponent_team_id",
+            f"{fantasy_points} AS fantasy_points",
+            f"{usage} AS usage",
+            # Already pre-game: the opponent's games before this one
+            "d.fp_last_20 AS dvp_last_20",
+        ]
+        + (["a.recompute_from"] if affected_only else [])
+    )
+    aggregates = ",\n            ".join(
+        f"{expr} AS {alias}" for alias, expr in window_aggregates(ROLLING_FEATURES).items()
+    )
+    window_defs = ",\n            ".join(
+        f"w{k} AS (PARTITION BY player_id ORDER BY game_date, game_id ROWS {k - 1} PRECEDING)"
+        for k in sorted({k for _, _, k, _ in ROLLING_FEATURES})
+    )
+    features = ",\n            ".join(base_cols + [rolling_sql(*spec) for spec in ROLLING_FEATURES])
+    if affected_only:
+        rows = "game_date >= recompute_from"
+    else:
+        rows = "game_date > :start AND game_date <= :end"
+
+    return f"""
+        WITH base AS (
+            SELECT
+            {select}
+            FROM {source} JOIN games g ON g.game_id = b.game_id
+            LEFT JOIN player_meta pm ON pm.player_id = b.player_id
+            LEFT JOIN dvp_games d
+                ON d.team_id = {opponent} AND d.position = pm.position AND d.game_id = b.game_id
+            {where}
+        ),
+        windowed AS (
+            SELECT base.*,
+            {aggregates}
+            FROM base
+            WINDOW
+            {window_defs}
+        )
+        SELECT
+            {features}
+        FROM windowed
+        WHERE {rows}
+        ORDER BY player_id, game_date, game_id
+    """
+
+
+def finish_chunk(df, schedule, dtypes):
+    """Std from variance, rest/travel, and compact dtypes for one streamed chunk."""
+    df["game_date"] = pd.to_datetime(df["game_date"])
+
+    rolled = [name for name, *_ in ROLLING_FEATURES]
+    df[rolled] = df[rolled].astype("float32")
+    for name, _, _, stat in ROLLING_FEATURES:
+        if stat == "std":
+            df[name] = np.sqrt(df[name].clip(lower=0))
+
+    # -------------------- Rest + Travel --------------------
+    df = df.merge(schedule, on=["game_id", "team_id"], how="left")
+    df["travel_km"] = df["travel_km"].fillna(0.0)
+    return frame_dtypes.compact(df, dtypes)
+
+
+def iter_features(conn, start=None, end=None, affected_only=False, bucket=None,
+                  chunk_rows=CHUNK_ROWS):
+    """
+    Stream feature rows for game_date in (start, end] in chunks.
+    bucket=(i, n) limits them to players with player_id % n == i;
+    affected_only streams temp.feature_affected instead (start / end unused).
+    """
+    games = pd.read_sql("SELECT * FROM games", conn, parse_dates=["game_date"])
+    schedule = team_schedule(games)
+    dtypes = column_dtypes(conn)
+
+    params = {"start": start or "", "end": end or "9999-12-31"}
+    if bucket is not None:
+        params.update(bucket=bucket[0], buckets=bucket[1])
+
+    chunks = pd.read_sql(
+        feature_query(conn, affected_only, bucketed=bucket is not None),
+        conn,
+        params=params,
+        chunksize=chunk_rows,
+    )
+    for chunk in chunks:
+        yield finish_chunk(chunk, schedule, dtypes)
+
+
+def load_features(conn, start=None, end=None, affected_only=False, bucket=None):
+    chunks = list(iter_features(conn, start, end, affected_only, bucket))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True)
+
+# ---------------------------------------------------------
+# Partitioned full build
 # ---------------------------------------------------------
-def load_raw():
+FEATURE_MEMORY_MB = float(os.getenv("NBA_FEATURE_MEMORY_MB", "1024"))
+FEATURE_WORKERS = int(os.getenv("NBA_FEATURE_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Peak bytes per feature row while a partition is fetched, finished and
+# handed back to the parent (measured on synthetic seasons, with headroom)
+ROW_BYTES = 4096
+
+
+def partition_count(n_rows, n_players, workers=FEATURE_WORKERS, memory_mb=FEATURE_MEMORY_MB):
+    """
+    Enough player buckets that the partitions in flight (one per worker
+    plus the one being written) fit the budget; at least one per worker,
+    but never more than there are players.
+    """
+    per_partition = memory_mb * 1024 * 1024 / (workers + 1)
+    n_buckets = max(workers, math.ceil(n_rows * ROW_BYTES / per_partition))
+    return max(min(n_buckets, n_players), 1)
+
+
+def build_partition(bucket, n_buckets):
+    """Feature rows for players with player_id % n_buckets == bucket."""
     with get_connection() as conn:
-        games = pd.read_sql("SELECT * FROM games", conn, parse_dates=["game_date"])
-        box = pd.read_sql("SELECT * FROM boxscores", conn)
-    return games, box
+        return load_features(conn, bucket=(bucket, n_buckets))
+
+
+def iter_partitions(n_buckets, workers=FEATURE_WORKERS):
+    """
+    Yield each partition's features as it finishes. At most `workers`
+    partitions are being computed (or waiting to be consumed) at a time.
+    """
+    if workers <= 1:
+        for bucket in range(n_buckets):
+            yield build_partition(bucket, n_buckets)
+        return
+
+    buckets = iter(range(n_buckets))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(build_partition, b, n_buckets) for b in islice(buckets, workers)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                bucket = next(buckets, None)
+                if bucket is not None:
+                    pending.add(pool.submit(build_partition, bucket, n_buckets))
+                yield future.result()
 
 # ---------------------------------------------------------
-def build_features():
-    print("Loading raw DB data...")
-    games, box = load_raw()
+def build_features(workers=FEATURE_WORKERS, memory_mb=FEATURE_MEMORY_MB):
+    """
+    Full rebuild: recompute every feature row from the whole history,
+    one player partition at a time. Returns the number of feature rows;
+    the rows themselves are in the "features" dataset.
+    """
+    with get_connection() as conn:
+        migrate(conn)
+        marker = games_updated_marker(conn)
+        dvp.update(conn, full=True)
+        n_rows, n_players = conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT player_id) FROM boxscores;"
+        ).fetchone()
 
-    print("Cleaning data...")
+    n_buckets = partition_count(n_rows, n_players, workers, memory_mb)
+    print(f"Computing features in SQLite: {n_rows} rows, {n_buckets} partition(s), "
+          f"{workers} worker(s)...")
 
-    df = box.merge(games, on="game_id", how="left")
+    rows, last_date = 0, None
+    with DatasetWriter(FEATURE_DATASET) as writer, get_connection() as conn:
+        conn.execute(f"DROP TABLE IF EXISTS {FEATURE_TABLE};")
 
-    # --- Fix minutes column ---
-    df["minutes"] = df["minutes"].apply(parse_minutes)
+        for part in iter_partitions(n_buckets, workers):
+            # player_id % n can leave a bucket empty (e.g. only even ids)
+            if part.empty:
+                continue
 
-    df = df.sort_values(["player_id", "game_date"])
+            writer.write(part)
+            part.to_sql(FEATURE_TABLE, conn, if_exists="append", index=False)
+            write_player_state(conn, part, replace=rows == 0)
 
-    # -------------------- Fantasy Points --------------------
-    df["fantasy_points"] = (
-        df["points"]
-        + df["rebounds"] * 1.2
-        + df["assists"] * 1.5
-        + df["steals"] * 3
-        + df["blocks"] * 3
-        - df["turnovers"]
+            rows += len(part)
+            part_last = part["game_date"].max()
+            last_date = part_last if last_date is None else max(last_date, part_last)
+            del part
+
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{FEATURE_TABLE}_player_date "
+            f"ON {FEATURE_TABLE}(player_id, game_date);"
+        )
+        if last_date is not None:
+            set_high_water_mark(conn, last_date.strftime("%Y-%m-%d"))
+        if marker is not None:
+            set_state(conn, "games_updated_at", marker)
+        conn.commit()
+
+    print(f"Saved {rows} feature rows → {writer.path}")
+    print("Done!")
+    return rows
+
+
+def mark_affected(conn, since, seen):
+    """
+    Fill temp.feature_affected with (player_id, recompute_from,
+    history_from) for every
+    player whose stored feature rows are stale: players in games dated
+    after `since` or rewritten by ingestion after `seen` (games.updated_at),
+    from that game on, and players who faced one of those games' defenses
+    in its next DVP_GAMES games, whose dvp_last_20 moved with it.
+    history_from is the date of the player's HISTORY_GAMES-th game before
+    recompute_from. Returns the affected players as a DataFrame.
+    """
+    conn.execute("DROP TABLE IF EXISTS temp.feature_changed_games;")
+    conn.execute("""
+        CREATE TEMP TABLE feature_changed_games AS
+        SELECT game_id FROM games WHERE game_date > :since
+        UNION
+        SELECT game_id FROM games WHERE updated_at > :seen;
+    """, {"since": since or "", "seen": seen or ""})
+
+    conn.execute("DROP TABLE IF EXISTS temp.feature_affected;")
+    conn.execute(f"""
+        CREATE TEMP TABLE feature_affected AS
+        WITH defenses AS (
+            SELECT b.opponent_team_id AS team_id, MIN(b.game_date) AS since
+            FROM temp.feature_changed_games c JOIN boxscores b ON b.game_id = c.game_id
+            GROUP BY b.opponent_team_id
+        ),
+        dvp_window AS (
+            SELECT d.team_id, d.since, COALESCE((
+                SELECT x.game_date FROM boxscores x
+                WHERE x.team_id = d.team_id AND x.game_date > d.since
+                GROUP BY x.game_date ORDER BY x.game_date
+                LIMIT 1 OFFSET {dvp.DVP_GAMES - 1}
+            ), '9999-12-31') AS until
+            FROM defenses d
+        ),
+        stale AS (
+            SELECT b.player_id, b.game_date
+            FROM temp.feature_changed_games c JOIN boxscores b ON b.game_id = c.game_id
+            UNION ALL
+            SELECT b.player_id, b.game_date
+            FROM dvp_window w
+            JOIN games g
+                ON g.game_date > w.since AND g.game_date <= w.until
+               AND w.team_id IN (g.home_team_id, g.away_team_id)
+            JOIN boxscores b ON b.game_id = g.game_id AND b.team_id <> w.team_id
+        ),
+        affected AS (
+            SELECT player_id, MIN(game_date) AS recompute_from
+            FROM stale
+            GROUP BY player_id
+        )
+        SELECT a.player_id, a.recompute_from, COALESCE((
+            SELECT h.game_date FROM boxscores h
+            WHERE h.player_id = a.player_id AND h.game_date < a.recompute_from
+            ORDER BY h.game_date DESC
+            LIMIT 1 OFFSET {HISTORY_GAMES - 1}
+        ), '') AS history_from
+        FROM affected a;
+    """)
+    return pd.read_sql(
+        "SELECT player_id, recompute_from FROM temp.feature_affected;",
+        conn, parse_dates=["recompute_from"],
     )
 
-    print("Computing rolling stats...")
-    df["fp_last_5"] = df.groupby("player_id")["fantasy_points"].rolling(5).mean().reset_index(0, drop=True)
-    df["fp_last_10"] = df.groupby("player_id")["fantasy_points"].rolling(10).mean().reset_index(0, drop=True)
-    df["minutes_last_5"] = df.groupby("player_id")["minutes"].rolling(5).mean().reset_index(0, drop=True)
 
-    # -------------------- Rest Days --------------------
-    print("Computing rest days...")
-    df["prev_game_date"] = df.groupby("team_id")["game_date"].shift(1)
-    df["days_rest"] = (df["game_date"] - df["prev_game_date"]).dt.days
+def stale_rows(affected):
+    """drop() for append_dataset: stored rows of affected players from recompute_from on."""
+    since = affected.set_index("player_id")["recompute_from"]
+    return lambda part: part["game_date"] >= part["player_id"].map(since)
 
-    # -------------------- Travel Distance --------------------
-    print("Computing travel...")
 
-    def compute_travel(row):
-        team = row["team_id"]
-        prev_date = row["prev_game_date"]
+def build_features_incremental():
+    """
+    Recompute features for games after the stored high-water mark and for
+    games ingestion rewrote since the last run (games.updated_at: live
+    games finalized, stat corrections). Each affected player's stored rows
+    are replaced from their earliest changed game on (see mark_affected).
+    Falls back to a full rebuild when no state exists yet.
 
-        if pd.isna(prev_date):
-            return 0
+    The stored "features" dataset is up to date afterwards; nothing is
+    returned.
+    """
+    with get_connection() as conn:
+        since = get_high_water_mark(conn)
+        n_tables = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (?, ?);",
+            (FEATURE_TABLE, PLAYER_STATE_TABLE),
+        ).fetchone()[0]
+
+    if since is None or n_tables < 2 or not dataset_exists(FEATURE_DATASET):
+        print("No feature state found, running full build...")
+        build_features()
+        return
+
+    print(f"Computing features for games after {since} or re-ingested since the last run...")
+    with get_connection() as conn:
+        migrate(conn)
+        dvp.update(conn)
+        marker = games_updated_marker(conn)
+        affected = mark_affected(conn, since, get_state(conn, "games_updated_at"))
+        new_rows = load_features(conn, affected_only=True) if len(affected) else pd.DataFrame()
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({FEATURE_TABLE});")]
+
+        if new_rows.empty:
+            if marker is not None:
+                set_state(conn, "games_updated_at", marker)
+                conn.commit()
+            print("No new or changed games. Features are up to date.")
+            return
 
-        lat1, lon1 = TEAM_LOCATIONS.get(team, (0, 0))
-        lat2, lon2 = TEAM_LOCATIONS.get(team, (0, 0))
+        # Keep the column layout of the stored features; if the feature set
+        # itself changed, the stored rows are stale and need a full rebuild.
+        rebuild = set(columns) != set(new_rows.columns)
+        if not rebuild:
+            new_rows = new_rows.reindex(columns=columns)
 
-        return haversine(lat1, lon1, lat2, lon2)
+            print(f"Replacing feature rows of {len(affected)} players "
+                  f"({len(new_rows)} rows from their earliest changed game)...")
+            conn.execute(f"""
+                DELETE FROM {FEATURE_TABLE} WHERE rowid IN (
+                    SELECT f.rowid FROM temp.feature_affected a
+                    JOIN {FEATURE_TABLE} f
+                        ON f.player_id = a.player_id AND f.game_date >= a.recompute_from
+                );
+            """)
+            new_rows.to_sql(FEATURE_TABLE, conn, if_exists="append", index=False)
+            write_player_state(conn, new_rows)
+            last_date = max(since, new_rows["game_date"].max().strftime("%Y-%m-%d"))
+            set_high_water_mark(conn, last_date)
+            if marker is not None:
+                set_state(conn, "games_updated_at", marker)
+            conn.commit()
 
-    df["travel_km"] = df.apply(compute_travel, axis=1)
+    if rebuild:
+        print("Feature columns changed, running full build...")
+        build_features()
+        return
 
-    # -------------------- Save Output --------------------
-    print(f"Saving features → {FEATURE_OUTPUT}")
-    df.to_csv(FEATURE_OUTPUT, index=False)
+    append_dataset(new_rows, FEATURE_DATASET, drop=stale_rows(affected),
+                   drop_from=affected["recompute_from"].min())
     print("Done!")
 
 # ---------------------------------------------------------
 if __name__ == "__main__":
+    import sys
+
     init_db()
-    build_features()
+    if "--full" in sys.argv[1:]:
+        build_features()
+    else:
+        build_features_incremental()
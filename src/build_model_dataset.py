@@ -2,23 +2,44 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from build_features_real import ROLLING_FEATURES
+from dataset_store import load_dataset, save_dataset
+
 BASE_DIR = Path(__file__).resolve().parents[1]
-FEATURE_PATH = BASE_DIR / "outputs" / "features.csv"
-OUTPUT_PATH = BASE_DIR / "outputs" / "model_dataset.csv"
-TRAIN_PATH = BASE_DIR / "outputs" / "train.csv"
-TEST_PATH = BASE_DIR / "outputs" / "test.csv"
+FEATURE_DATASET = "features"
+OUTPUT_DATASET = "model_dataset"
+TRAIN_DATASET = "train"
+TEST_DATASET = "test"
+
+TRAIN_FRACTION = 0.80
+
+# Rolling "form" columns include the game's own stats. For modeling they
+# are shifted back one game per player, so each row only carries what was
+# known before tip-off -- the same latest state projection_engine feeds
+# the models when projecting the next game.
+FORM_COLUMNS = [out for out, _, _, _ in ROLLING_FEATURES]
 
 # ----------------------------------------------------------
 # 1. Load Features
 # ----------------------------------------------------------
 
 def load_features():
-    if not FEATURE_PATH.exists():
-        raise FileNotFoundError(f"Missing features: {FEATURE_PATH}")
-    return pd.read_csv(FEATURE_PATH, parse_dates=["game_date"])
+    return load_dataset(FEATURE_DATASET)
+
+# ----------------------------------------------------------
+# 2. Pre-game alignment
+# ----------------------------------------------------------
+
+def pregame_features(df):
+    df = df.sort_values(["player_id", "game_date"]).reset_index(drop=True)
+    cols = [c for c in FORM_COLUMNS if c in df.columns]
+
+    first_game = df["player_id"].ne(df["player_id"].shift())
+    df[cols] = df[cols].shift(1).mask(first_game)
+    return df
 
 # ----------------------------------------------------------
-# 2. Clean + Filter
+# 3. Clean + Filter
 # ----------------------------------------------------------
 
 def clean_df(df):
@@ -30,14 +51,13 @@ def clean_df(df):
     # Usually remove tiny-minute flukes (< 5)
     df = df[df["minutes"] >= 5]
 
-    # Drop duplicates if ingestion somehow duplicated
-    df = df.drop_duplicates(subset=["game_id", "player_id"])
+    # No dedupe needed: ingestion upserts on (game_id, player_id)
 
     print("After cleaning:", len(df))
     return df
 
 # ----------------------------------------------------------
-# 3. Define Target + Features
+# 4. Define Target + Features
 # ----------------------------------------------------------
 
 def select_columns(df):
@@ -62,21 +82,27 @@ def select_columns(df):
     return df, target, feature_cols
 
 # ----------------------------------------------------------
-# 4. Train/Test Split
+# 5. Train/Test Split
 # ----------------------------------------------------------
 
+def time_split_cutoff(dates, train_fraction=TRAIN_FRACTION):
+    """Date at the train_fraction row of `dates` in time order (inclusive in train)."""
+    dates = pd.Series(dates).sort_values(ignore_index=True)
+    return dates.iloc[min(int(len(dates) * train_fraction), len(dates) - 1)]
+
+
 def train_test_split(df, cutoff_date=None):
     """
     If cutoff_date=None:
        → split by time (80% old → train, 20% recent → test)
+
+    The model trainers split with the same cutoff (time_split_cutoff).
     """
 
     df = df.sort_values("game_date")
 
     if cutoff_date is None:
-        # 80% date-based split
-        cutoff_index = int(len(df) * 0.80)
-        cutoff_date = df.iloc[cutoff_index]["game_date"]
+        cutoff_date = time_split_cutoff(df["game_date"])
 
     train = df[df["game_date"] <= cutoff_date].copy()
     test = df[df["game_date"] > cutoff_date].copy()
@@ -88,25 +114,22 @@ def train_test_split(df, cutoff_date=None):
     return train, test, cutoff_date
 
 # ----------------------------------------------------------
-# 5. Save
+# 6. Save
 # ----------------------------------------------------------
 
 def save(train, test, full):
-    full.to_csv(OUTPUT_PATH, index=False)
-    train.to_csv(TRAIN_PATH, index=False)
-    test.to_csv(TEST_PATH, index=False)
-
-    print(f"Saved full model dataset → {OUTPUT_PATH}")
-    print(f"Saved train → {TRAIN_PATH}")
-    print(f"Saved test → {TEST_PATH}")
+    print(f"Saved full model dataset → {save_dataset(full, OUTPUT_DATASET)}")
+    print(f"Saved train → {save_dataset(train, TRAIN_DATASET)}")
+    print(f"Saved test → {save_dataset(test, TEST_DATASET)}")
 
 # ----------------------------------------------------------
 # Main
 # ----------------------------------------------------------
 
-def main():
-    print("Loading features...")
-    df = load_features()
+def build(df):
+    """Features frame -> (full, train, test) model datasets, saved to the store."""
+    print("Aligning features to pre-game state...")
+    df = pregame_features(df)
 
     print("Cleaning...")
     df = clean_df(df)
@@ -124,6 +147,12 @@ def main():
     save(train, test, df)
 
     print("Model dataset build complete.")
+    return df, train, test
+
+
+def main():
+    print("Loading features...")
+    build(load_features())
 
 
 if __name__ == "__main__":
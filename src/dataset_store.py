@@ -0,0 +1,385 @@
+"""
+dataset_store.py
+
+Storage for the DataFrames handed between pipeline stages.
+
+Datasets are referred to by name (see DATASETS) and stored in a typed,
+compressed columnar format so the next stage can load only the columns it
+needs. Parquet is the default; set NBA_DATASET_FORMAT to "feather" or
+"csv" to switch. NBA_DATASET_EXPORT_CSV=1 also writes a .csv copy next to
+every saved dataset for eyeballing / spreadsheets.
+
+Loading falls back to any format already on disk, so older CSV outputs
+still work after switching formats, and returns frames in the compact
+dtypes of frame_dtypes.py whatever format they were stored in.
+
+Appending to a parquet / feather dataset (the daily incremental feature
+build) turns it into a directory of part files, read back together with
+pyarrow.dataset, so an append writes only the new rows and the parts it
+replaces rows in rather than the whole history.
+"""
+
+import os
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+import frame_dtypes
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+OUTPUT_DIR = Path(os.getenv("NBA_OUTPUT_DIR", BASE_DIR / "outputs"))
+
+# Dataset name -> path without suffix
+DATASETS = {
+    "features": OUTPUT_DIR / "features",
+    "model_dataset": OUTPUT_DIR / "model_dataset",
+    "train": OUTPUT_DIR / "train",
+    "test": OUTPUT_DIR / "test",
+}
+
+FORMAT = os.getenv("NBA_DATASET_FORMAT", "parquet")
+EXPORT_CSV = os.getenv("NBA_DATASET_EXPORT_CSV", "0") == "1"
+
+SUFFIXES = {
+    "parquet": ".parquet",
+    "feather": ".feather",
+    "csv": ".csv",
+}
+
+DATE_COLUMNS = ["game_date", "prev_game_date"]
+
+
+# ---------------------------
+# Paths
+# ---------------------------
+
+def dataset_path(name: str, fmt: Optional[str] = None) -> Path:
+    fmt = fmt or FORMAT
+    if fmt not in SUFFIXES:
+        raise ValueError(f"Unknown dataset format: {fmt}")
+    base = DATASETS.get(name, Path(name))
+    return base.with_suffix(SUFFIXES[fmt])
+
+
+def find_dataset(name: str) -> Optional[Path]:
+    """
+    Path of the stored dataset, preferring the configured format: a file,
+    or the parts directory of an appended dataset.
+    """
+    for fmt in [FORMAT] + [f for f in SUFFIXES if f != FORMAT]:
+        if fmt != "csv" and _parts(parts_dir(name), fmt):
+            return parts_dir(name)
+        path = dataset_path(name, fmt)
+        if path.exists():
+            return path
+    return None
+
+
+def dataset_exists(name: str) -> bool:
+    return find_dataset(name) is not None
+
+
+# ---------------------------
+# Save / load
+# ---------------------------
+
+def save_dataset(df: pd.DataFrame, name: str, fmt: Optional[str] = None,
+                 export_csv: Optional[bool] = None) -> Path:
+    fmt = fmt or FORMAT
+    path = dataset_path(name, fmt)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    df = df.reset_index(drop=True)
+    if fmt == "parquet":
+        df.to_parquet(path, index=False, compression="zstd")
+    elif fmt == "feather":
+        df.to_feather(path, compression="zstd")
+    else:
+        df.to_csv(path, index=False)
+    _remove_parts(name)
+
+    # Drop stale copies in other formats so loads can't pick them up
+    for other in SUFFIXES:
+        if other != fmt and (other != "csv" or not _export(export_csv)):
+            dataset_path(name, other).unlink(missing_ok=True)
+
+    if fmt != "csv" and _export(export_csv):
+        df.to_csv(dataset_path(name, "csv"), index=False)
+
+    return path
+
+
+def load_dataset(name: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Load a dataset, reading only `columns` when given."""
+    path = find_dataset(name)
+    if path is None:
+        raise FileNotFoundError(f"Missing dataset: {dataset_path(name)}")
+
+    if path.is_dir():
+        df = _load_parts(path, columns)
+    elif path.suffix == ".parquet":
+        df = pd.read_parquet(path, columns=columns)
+    elif path.suffix == ".feather":
+        df = pd.read_feather(path, columns=columns)
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        dates = [c for c in DATE_COLUMNS if c in header and (columns is None or c in columns)]
+        df = pd.read_csv(path, usecols=columns, parse_dates=dates)
+    return frame_dtypes.compact(df)
+
+
+def append_dataset(df: pd.DataFrame, name: str,
+                   drop: Optional[Callable[[pd.DataFrame], pd.Series]] = None,
+                   drop_from=None) -> Path:
+    """
+    Add rows to a stored dataset. drop(piece) marks stored rows that df
+    replaces (a boolean mask per piece read back); drop_from, if given, is
+    the earliest game_date it can mark, so parts ending before it are left
+    alone.
+
+    Parquet / feather datasets become a directory of part files on the
+    first append (the stored file is moved in as part 0) and every append
+    adds one part, so only df and the parts holding dropped rows are
+    written. A full save replaces the directory with a single file again.
+    CSV without drop appends in place; with drop it is rewritten.
+    """
+    path = find_dataset(name)
+    if path is None:
+        return save_dataset(df, name)
+
+    if path.suffix == ".csv":
+        if drop is None:
+            df.to_csv(path, mode="a", header=False, index=False)
+            return path
+
+        header = pd.read_csv(path, nrows=0).columns
+        dates = [c for c in DATE_COLUMNS if c in header]
+        with DatasetWriter(name, fmt="csv") as writer:
+            for piece in pd.read_csv(path, parse_dates=dates, chunksize=100_000):
+                piece = piece[~drop(piece).to_numpy(dtype=bool)]
+                if len(piece):
+                    writer.write(piece)
+            writer.write(df)
+        return writer.path
+
+    import pyarrow as pa
+
+    if path.is_file():
+        fmt = next(f for f, suffix in SUFFIXES.items() if suffix == path.suffix)
+        directory = parts_dir(name)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = path.replace(directory / f"part-00000{SUFFIXES[fmt]}").parent
+    fmt = _parts_format(path)
+    parts = _parts(path, fmt)
+    schema = _stored_schema(_read_part(parts[0], fmt, schema_only=True))
+
+    # New rows go in first: a reader in between may see a replaced row
+    # twice, but never miss one
+    number = int(parts[-1].stem.split("-")[1]) + 1
+    _write_part(pa.Table.from_pandas(df.reset_index(drop=True), schema=schema, preserve_index=False),
+                path / f"part-{number:05d}{SUFFIXES[fmt]}", fmt)
+
+    if drop is not None:
+        for part in parts:
+            if drop_from is not None:
+                dates = _read_part(part, fmt, columns=["game_date"]).column("game_date").to_pandas()
+                if dates.empty or dates.max() < pd.Timestamp(drop_from):
+                    continue
+            piece = _read_part(part, fmt).to_pandas()
+            stale = drop(piece).to_numpy(dtype=bool)
+            if not stale.any():
+                continue
+            if stale.all():
+                part.unlink()
+            else:
+                kept = piece[~stale].reset_index(drop=True)
+                _write_part(pa.Table.from_pandas(kept, schema=schema, preserve_index=False), part, fmt)
+
+    if _export(None):
+        csv_path = dataset_path(name, "csv")
+        tmp_path = csv_path.with_suffix(".csv.tmp")
+        for i, part in enumerate(_parts(path, fmt)):
+            piece = _read_part(part, fmt).to_pandas()
+            piece.to_csv(tmp_path, mode="a" if i else "w", header=not i, index=False)
+        tmp_path.replace(csv_path)
+    return path
+
+
+# ---------------------------
+# Part files
+# ---------------------------
+
+def parts_dir(name: str) -> Path:
+    """Directory an appended parquet / feather dataset keeps its parts in."""
+    return DATASETS.get(name, Path(name))
+
+
+def _parts(directory: Path, fmt: str) -> List[Path]:
+    return sorted(directory.glob(f"part-*{SUFFIXES[fmt]}"))
+
+
+def _parts_format(directory: Path) -> Optional[str]:
+    for fmt in ("parquet", "feather"):
+        if _parts(directory, fmt):
+            return fmt
+    return None
+
+
+def _read_part(path: Path, fmt: str, columns: Optional[List[str]] = None, schema_only: bool = False):
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_schema(path) if schema_only else pq.read_table(path, columns=columns)
+
+    import pyarrow.feather as feather
+
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    return table.schema if schema_only else table
+
+
+def _write_part(table, path: Path, fmt: str) -> None:
+    """Write one part next to its final path and move it into place."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, tmp_path, compression="zstd")
+    else:
+        import pyarrow.feather as feather
+
+        feather.write_feather(table, tmp_path, compression="zstd")
+    tmp_path.replace(path)
+
+
+def _load_parts(directory: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    import pyarrow.dataset as ds
+
+    fmt = _parts_format(directory)
+    parts = _parts(directory, fmt)
+    schema = _stored_schema(_read_part(parts[0], fmt, schema_only=True))
+    dataset = ds.dataset([str(p) for p in parts], schema=schema, format=fmt)
+    return dataset.to_table(columns=columns).to_pandas()
+
+
+def _remove_parts(name: str) -> None:
+    """Drop the part files of an appended dataset after a full save."""
+    directory = parts_dir(name)
+    for part in directory.glob("part-*"):
+        part.unlink()
+    if directory.is_dir() and not any(directory.iterdir()):
+        directory.rmdir()
+
+
+def _stored_schema(schema):
+    """
+    The schema parts are stored with: a text column that is all null in
+    the first piece still holds text, and categoricals are stored as their
+    values, since every piece has its own categories (and so its own
+    dictionary index width).
+    """
+    import pyarrow as pa
+
+    def stored_type(t):
+        if pa.types.is_null(t):
+            return pa.string()
+        return t.value_type if pa.types.is_dictionary(t) else t
+
+    return pa.schema([f.with_type(stored_type(f.type)) for f in schema], metadata=schema.metadata)
+
+
+# ---------------------------
+# Streaming writes
+# ---------------------------
+
+class DatasetWriter:
+    """
+    Write a dataset in pieces without holding all of it in memory:
+    parquet row groups, feather record batches, or CSV appends.
+
+    The file is written next to its final path and moved into place on
+    close, so readers never see a partial dataset. Every piece must have
+    the columns and dtypes of the first; all-null text columns are fine.
+
+        with DatasetWriter("features") as writer:
+            for part in parts:
+                writer.write(part)
+    """
+
+    def __init__(self, name: str, fmt: Optional[str] = None, export_csv: Optional[bool] = None):
+        self.name = name
+        self.fmt = fmt or FORMAT
+        self.export_csv = _export(export_csv) and self.fmt != "csv"
+        self.path = dataset_path(name, self.fmt)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.csv_tmp_path = dataset_path(name, "csv").with_suffix(".csv.tmp")
+        self.rows = 0
+        self.pieces = 0
+        self._schema = None
+        self._writer = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._abort()
+
+    def write(self, df: pd.DataFrame):
+        df = df.reset_index(drop=True)
+        if self.fmt == "csv" or self.export_csv:
+            target = self.tmp_path if self.fmt == "csv" else self.csv_tmp_path
+            df.to_csv(target, mode="a" if self.pieces else "w", header=not self.pieces, index=False)
+
+        if self.fmt != "csv":
+            import pyarrow as pa
+
+            if self._writer is None:
+                self._open(pa.Schema.from_pandas(df, preserve_index=False))
+            self._writer.write_table(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+        self.rows += len(df)
+        self.pieces += 1
+
+    def _open(self, schema):
+        schema = _stored_schema(schema)
+        self._schema = schema
+
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(self.tmp_path, schema, compression="zstd")
+        else:
+            import pyarrow.ipc as ipc
+
+            self._writer = ipc.new_file(
+                str(self.tmp_path), schema, options=ipc.IpcWriteOptions(compression="zstd")
+            )
+
+    def close(self) -> Path:
+        if not self.pieces:
+            raise ValueError(f"Nothing written to dataset {self.name}")
+        if self._writer is not None:
+            self._writer.close()
+        self.tmp_path.replace(self.path)
+        _remove_parts(self.name)
+        if self.export_csv:
+            self.csv_tmp_path.replace(dataset_path(self.name, "csv"))
+
+        # Drop stale copies in other formats so loads can't pick them up
+        for other in SUFFIXES:
+            if other != self.fmt and (other != "csv" or not self.export_csv):
+                dataset_path(self.name, other).unlink(missing_ok=True)
+        return self.path
+
+    def _abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        self.tmp_path.unlink(missing_ok=True)
+        self.csv_tmp_path.unlink(missing_ok=True)
+
+
+def _export(export_csv: Optional[bool]) -> bool:
+    return EXPORT_CSV if export_csv is None else export_csv
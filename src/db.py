@@ -2,16 +2,19 @@
 db.py
 
 Database helper functions for the NBA forecasting project.
-Creates and initializes the SQLite database using sql/schema.sql.
+Creates the SQLite database and brings it to the current schema
+(see migrations.py; sql/schema.sql is a reference copy).
 """
 
 import sqlite3
+import os
 from pathlib import Path
 
+import migrations
+
 # Base directory = repo root (two levels up from this file)
 BASE_DIR = Path(__file__).resolve().parents[1]
-DB_PATH = BASE_DIR / "data" / "nba_forecasting.db"
-SCHEMA_PATH = BASE_DIR / "sql" / "schema.sql"
+DB_PATH = Path(os.getenv("NBA_DB_PATH", BASE_DIR / "data" / "nba_forecasting.db"))
 
 
 def get_connection() -> sqlite3.Connection:
@@ -23,15 +26,12 @@ def get_connection() -> sqlite3.Connection:
 
 
 def init_db() -> None:
-    """Initialize the database by running the schema.sql script."""
+    """Create the database or migrate it to the current schema."""
     with get_connection() as conn:
-        with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
-            schema_sql = f.read()
-        conn.executescript(schema_sql)
-        conn.commit()
+        migrations.migrate(conn)
 
 
 if __name__ == "__main__":
-    print(f"Initializing database at {DB_PATH} using schema {SCHEMA_PATH}...")
+    print(f"Initializing database at {DB_PATH}...")
     init_db()
     print("Database initialized successfully.")
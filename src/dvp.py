@@ -0,0 +1,389 @@
+# src/dvp.py
+
+"""
+dvp.py
+
+Defense vs Position (DvP): fantasy points a defense allows per opposing
+player at each position, over its last DVP_GAMES games.
+
+Kept in SQLite and updated only with games not seen before:
+
+    player_meta   position per player (G / F / C), cached from the
+                  PlayerIndex endpoint through api_cache, or inferred from
+                  the player's assist / rebound mix when the endpoint is
+                  unavailable (offline runs, synthetic data); inferred
+                  positions are looked up again whenever the player
+                  shows up in a new or rewritten game
+    dvp_games     one row per (defense, position, game): fantasy points
+                  allowed and players faced, plus fp_last_20, the rate over
+                  the defense's previous DVP_GAMES games (this one
+                  excluded, so it is a pre-game value)
+    dvp           running sums over each (defense, position)'s latest
+                  DVP_GAMES games: the value for its next game
+    dvp_state     the latest games.updated_at already folded in, so games
+                  ingestion rewrites later (finalized, corrected) are
+                  re-aggregated on the next update
+
+The feature build joins fp_last_20 onto every player row as dvp_last_20.
+Projection looks the slate opponent up in a dense teams x POSITIONS array
+built from dvp (see current_dvp).
+
+Usage:
+    python src/dvp.py            # update with new games
+    python src/dvp.py --full     # rebuild from every boxscore
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import api_cache
+import scoring
+
+DVP_GAMES = 20
+POSITIONS = ["G", "F", "C"]
+
+PLAYER_INDEX_TTL = 7 * 24 * 60 * 60    # rosters move; positions rarely do
+
+# Assists per rebound above / below which an unlisted player counts as a
+# guard / center (NBA guards sit around 0.8-1.8, centers around 0.2)
+GUARD_AST_PER_REB = 0.6
+CENTER_AST_PER_REB = 0.3
+
+DVP_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS dvp_games (
+        team_id     INTEGER NOT NULL,
+        position    TEXT NOT NULL,
+        game_id     TEXT NOT NULL,
+        game_date   TEXT,
+        fp_sum      REAL,
+        n_players   INTEGER,
+        fp_last_20  REAL,
+        PRIMARY KEY (team_id, position, game_id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_dvp_games_date ON dvp_games(team_id, position, game_date, game_id);
+    CREATE INDEX IF NOT EXISTS idx_dvp_games_game ON dvp_games(game_id);
+
+    CREATE TABLE IF NOT EXISTS dvp (
+        team_id         INTEGER NOT NULL,
+        position        TEXT NOT NULL,
+        n_games         INTEGER,
+        fp_sum          REAL,
+        n_players       INTEGER,
+        fp_per_player   REAL,
+        last_game_date  TEXT,
+        PRIMARY KEY (team_id, position)
+    );
+
+    CREATE TABLE IF NOT EXISTS dvp_state (
+        key     TEXT PRIMARY KEY,
+        value   TEXT
+    );
+"""
+
+
+def init_dvp_tables(conn):
+    for statement in DVP_TABLES_SQL.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def table_exists(conn, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?;", (name,)
+    ).fetchone() is not None
+
+
+# ---------------------------
+# Player positions
+# ---------------------------
+
+def normalize_position(value) -> str | None:
+    """'G', 'F-C', 'Guard-Forward' -> the first listed of POSITIONS."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    primary = value.strip().split("-")[0][:1].upper()
+    return primary if primary in POSITIONS else None
+
+
+def fetch_positions() -> pd.DataFrame:
+    """player_id, position from PlayerIndex (every player, historical too)."""
+    def fetch():
+        from ingest_boxscores import retry_api_call
+        from nba_api.stats.endpoints import PlayerIndex
+
+        return retry_api_call(PlayerIndex, historical_nullable=1)
+
+    index = api_cache.cached_call(
+        "PlayerIndex", {"historical": 1}, fetch, ttl=PLAYER_INDEX_TTL
+    ).get_data_frames()[0]
+    return pd.DataFrame({
+        "player_id": index["PERSON_ID"].astype("int64"),
+        "position": index["POSITION"].map(normalize_position),
+    }).dropna()
+
+
+def infer_positions(stats: pd.DataFrame) -> pd.Series:
+    """G / F / C from career assists per rebound."""
+    ratio = stats["assists"] / stats["rebounds"].clip(lower=1)
+    return pd.Series(
+        np.select([ratio >= GUARD_AST_PER_REB, ratio <= CENTER_AST_PER_REB], ["G", "C"], "F"),
+        index=stats.index,
+    )
+
+
+def refresh_player_meta(conn, games: str | None = None) -> int:
+    """
+    Add a player_meta row for every boxscore player without one, and look
+    up positions previously inferred from stats again in PlayerIndex.
+    With `games` (a table of game_ids), only players in those games are
+    considered. Listed positions are never recomputed. Returns the number
+    of stored positions that changed.
+    """
+    if games is None:
+        players = "SELECT DISTINCT player_id FROM boxscores"
+    else:
+        players = f"""
+            SELECT DISTINCT b.player_id FROM {games} g JOIN boxscores b ON b.game_id = g.game_id
+        """
+    todo = pd.read_sql(f"""
+        WITH todo AS (
+            SELECT p.player_id, pm.position AS stored
+            FROM ({players}) p
+            LEFT JOIN player_meta pm ON pm.player_id = p.player_id
+            WHERE pm.player_id IS NULL OR pm.source = 'stats'
+        )
+        SELECT t.player_id, t.stored,
+               SUM(COALESCE(b.assists, 0)) AS assists, SUM(COALESCE(b.rebounds, 0)) AS rebounds
+        FROM todo t JOIN boxscores b ON b.player_id = t.player_id
+        GROUP BY t.player_id, t.stored;
+    """, conn)
+    if todo.empty:
+        return 0
+
+    try:
+        listed = fetch_positions()
+    except (ImportError, api_cache.OfflineCacheMiss, RuntimeError, KeyError, ValueError) as e:
+        # No nba_api, offline without a cached index, retries exhausted, or
+        # an unexpected response layout; inferred rows keep their position
+        todo = todo[todo["stored"].isna()].reset_index(drop=True)
+        if todo.empty:
+            return 0
+        print(f"PlayerIndex unavailable ({e}); inferring positions from stats")
+        listed = pd.DataFrame({"player_id": pd.Series(dtype="int64"), "position": pd.Series(dtype=object)})
+
+    meta = todo[["player_id"]].merge(listed, on="player_id", how="left")
+    meta["source"] = np.where(meta["position"].notna(), "nba_api", "stats")
+    unlisted = meta["position"].isna()
+    # Players still unlisted keep their first inferred position
+    meta.loc[unlisted, "position"] = todo["stored"][unlisted].fillna(infer_positions(todo[unlisted]))
+    meta["updated_at"] = datetime.utcnow().isoformat()
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO player_meta (player_id, position, source, updated_at) VALUES (?, ?, ?, ?);",
+        meta[["player_id", "position", "source", "updated_at"]].astype(object).itertuples(index=False),
+    )
+    new = todo["stored"].isna()
+    changed = int((~new & (meta["position"] != todo["stored"])).sum())
+    if new.any():
+        print(f"Cached positions for {int(new.sum())} players "
+              f"({int((new & unlisted).sum())} inferred from stats)")
+    if changed:
+        print(f"Corrected {changed} inferred positions from PlayerIndex")
+    return changed
+
+
+# ---------------------------
+# Incremental update
+# ---------------------------
+
+def get_state(conn, key: str):
+    row = conn.execute("SELECT value FROM dvp_state WHERE key = ?;", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_state(conn, key: str, value) -> None:
+    conn.execute("""
+        INSERT INTO dvp_state (key, value) VALUES (?, ?)
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value;
+    """, (key, value))
+
+
+def mark_new_games(conn, seen=None) -> int:
+    """
+    Fill temp.dvp_new_games with games that have boxscores and are either
+    missing from dvp_games or were rewritten by ingestion after `seen`
+    (games.updated_at; seen=None skips that check). Returns how many
+    there are.
+    """
+    conn.execute("DROP TABLE IF EXISTS temp.dvp_new_games;")
+    conn.execute("""
+        CREATE TEMP TABLE dvp_new_games AS
+        SELECT g.game_id FROM games g
+        WHERE NOT EXISTS (SELECT 1 FROM dvp_games d WHERE d.game_id = g.game_id)
+          AND EXISTS (SELECT 1 FROM boxscores b WHERE b.game_id = g.game_id)
+        UNION
+        SELECT g.game_id FROM games g
+        WHERE g.updated_at > :seen
+          AND EXISTS (SELECT 1 FROM boxscores b WHERE b.game_id = g.game_id);
+    """, {"seen": "9999" if seen is None else seen})
+    return conn.execute("SELECT COUNT(*) FROM temp.dvp_new_games;").fetchone()[0]
+
+
+def update(conn, full: bool = False) -> int:
+    """
+    Fold games missing from dvp_games, or rewritten by ingestion since the
+    last update, into it; recompute fp_last_20 for the affected defenses
+    from their earliest such game on (so backfilled and corrected games
+    are placed correctly), and refresh their dvp rows.
+    full=True rebuilds everything. Returns the number of games folded in.
+    """
+    init_dvp_tables(conn)
+    marker = conn.execute("SELECT MAX(updated_at) FROM games;").fetchone()[0]
+
+    if not full:
+        n_games = mark_new_games(conn, get_state(conn, "games_updated_at") or "")
+        if refresh_player_meta(conn, "temp.dvp_new_games"):
+            # Past games were grouped under the old positions
+            print("Player positions changed; rebuilding DvP from every game")
+            full = True
+    else:
+        refresh_player_meta(conn)
+
+    if full:
+        conn.execute("DELETE FROM dvp_games;")
+        conn.execute("DELETE FROM dvp;")
+        n_games = mark_new_games(conn)
+
+    if marker is not None:
+        set_state(conn, "games_updated_at", marker)
+    if not n_games:
+        conn.commit()
+        return 0
+
+    # Rewritten games are aggregated again from scratch
+    conn.execute("DELETE FROM dvp_games WHERE game_id IN (SELECT game_id FROM temp.dvp_new_games);")
+
+    # Players who got on the floor, by the defense they faced
+    fp_col = scoring.score_column(scoring.DEFAULT_SITE)
+    conn.execute(f"""
+        INSERT OR REPLACE INTO dvp_games (team_id, position, game_id, game_date, fp_sum, n_players)
+        SELECT b.opponent_team_id, pm.position, b.game_id, b.game_date, SUM(b.{fp_col}), COUNT(*)
+        FROM temp.dvp_new_games n
+        JOIN boxscores b ON b.game_id = n.game_id
+        JOIN player_meta pm ON pm.player_id = b.player_id
+        WHERE b.minutes > 0 AND b.opponent_team_id IS NOT NULL AND pm.position IS NOT NULL
+        GROUP BY b.opponent_team_id, pm.position, b.game_id;
+    """)
+
+    conn.execute("DROP TABLE IF EXISTS temp.dvp_affected;")
+    conn.execute("""
+        CREATE TEMP TABLE dvp_affected AS
+        SELECT b.opponent_team_id AS team_id, MIN(b.game_date) AS since
+        FROM temp.dvp_new_games n JOIN boxscores b ON b.game_id = n.game_id
+        WHERE b.opponent_team_id IS NOT NULL
+        GROUP BY b.opponent_team_id;
+    """)
+
+    # Pre-game rate: the DVP_GAMES games before this one
+    conn.execute(f"""
+        UPDATE dvp_games SET fp_last_20 = w.rate
+        FROM (
+            SELECT d.rowid AS rid, d.game_date, a.since,
+                   SUM(d.fp_sum) OVER w * 1.0 / SUM(d.n_players) OVER w AS rate
+            FROM dvp_games d JOIN temp.dvp_affected a ON a.team_id = d.team_id
+            WINDOW w AS (
+                PARTITION BY d.team_id, d.position ORDER BY d.game_date, d.game_id
+                ROWS BETWEEN {DVP_GAMES} PRECEDING AND 1 PRECEDING
+            )
+        ) AS w
+        WHERE dvp_games.rowid = w.rid AND w.game_date >= w.since;
+    """)
+
+    # Running sums over the latest DVP_GAMES games: the rate for the next game
+    conn.execute("DELETE FROM dvp WHERE team_id IN (SELECT team_id FROM temp.dvp_affected);")
+    conn.execute(f"""
+        INSERT INTO dvp (team_id, position, n_games, fp_sum, n_players, fp_per_player, last_game_date)
+        SELECT team_id, position, COUNT(*), SUM(fp_sum), SUM(n_players),
+               SUM(fp_sum) * 1.0 / SUM(n_players), MAX(game_date)
+        FROM (
+            SELECT d.*, ROW_NUMBER() OVER (
+                PARTITION BY d.team_id, d.position ORDER BY d.game_date DESC, d.game_id DESC
+            ) AS recency
+            FROM dvp_games d
+            WHERE d.team_id IN (SELECT team_id FROM temp.dvp_affected)
+        )
+        WHERE recency <= {DVP_GAMES}
+        GROUP BY team_id, position;
+    """)
+    conn.commit()
+    return n_games
+
+
+# ---------------------------
+# Dense lookup
+# ---------------------------
+
+def load_matrix(conn):
+    """
+    (team_ids, matrix): sorted defense ids and a len(team_ids) x
+    len(POSITIONS) array of their current rates (NaN where unknown).
+    """
+    if not table_exists(conn, "dvp"):
+        return np.empty(0, dtype=np.int64), np.empty((0, len(POSITIONS)))
+
+    rates = pd.read_sql("SELECT team_id, position, fp_per_player FROM dvp;", conn)
+    team_ids = np.unique(rates["team_id"].to_numpy(dtype=np.int64))
+    matrix = np.full((len(team_ids), len(POSITIONS)), np.nan)
+
+    rows = np.searchsorted(team_ids, rates["team_id"].to_numpy(dtype=np.int64))
+    cols = pd.Categorical(rates["position"], categories=POSITIONS).codes
+    known = cols >= 0
+    matrix[rows[known], cols[known]] = rates["fp_per_player"].to_numpy()[known]
+    return team_ids, matrix
+
+
+def lookup(team_ids, matrix, opponent_ids, positions) -> np.ndarray:
+    """matrix[opponent, position] per row; NaN for unknown teams / positions."""
+    opponent_ids = np.asarray(opponent_ids, dtype=np.int64)
+    out = np.full(len(opponent_ids), np.nan)
+    if not len(team_ids):
+        return out
+
+    rows = np.searchsorted(team_ids, opponent_ids).clip(0, len(team_ids) - 1)
+    cols = pd.Categorical(positions, categories=POSITIONS).codes
+    known = (team_ids[rows] == opponent_ids) & (cols >= 0)
+    out[known] = matrix[rows[known], cols[known]]
+    return out
+
+
+def player_positions(conn, player_ids) -> np.ndarray:
+    if not table_exists(conn, "player_meta"):
+        return np.full(len(player_ids), None, dtype=object)
+    meta = pd.read_sql("SELECT player_id, position FROM player_meta;", conn)
+    return pd.Series(np.asarray(player_ids, dtype=np.int64)).map(
+        meta.set_index("player_id")["position"]
+    ).to_numpy(dtype=object)
+
+
+def current_dvp(conn, player_ids, opponent_ids) -> np.ndarray:
+    """Each player's DvP against opponent_ids, as of the latest games."""
+    team_ids, matrix = load_matrix(conn)
+    return lookup(team_ids, matrix, opponent_ids, player_positions(conn, player_ids))
+
+
+if __name__ == "__main__":
+    import sys
+
+    from db import get_connection
+    from migrations import migrate
+
+    with get_connection() as conn:
+        migrate(conn)
+        n = update(conn, full="--full" in sys.argv[1:])
+        team_ids, matrix = load_matrix(conn)
+
+    print(f"Added {n} games to dvp_games")
+    print(pd.DataFrame(matrix, index=team_ids, columns=POSITIONS).round(2).to_string())
@@ -0,0 +1,127 @@
+# src/frame_dtypes.py
+
+"""
+frame_dtypes.py
+
+Compact in-memory dtypes for boxscore and feature frames.
+
+pandas reads SQLite, parquet and CSV columns as int64 / float64 / object,
+which for a boxscore row is mostly wasted width. Every stage that loads a
+frame (the feature build, dataset_store.load_dataset, player state for
+projection) passes it through compact(), which casts by column name:
+
+    ids (player_id, team_id, ...)      -> int32
+    game_id, season                    -> category
+    counting stats                     -> int8 / int16
+    dates                              -> datetime64
+    any other float64 (minutes, fantasy points, rolling features)
+                                       -> float32
+
+Integer columns holding NULLs use the nullable Int8 / Int16 / Int32
+dtypes; parquet / feather store them with the same type either way.
+"""
+
+import numpy as np
+import pandas as pd
+
+ID_COLUMNS = [
+    "player_id",
+    "team_id",
+    "opponent_team_id",
+    "home_team_id",
+    "away_team_id",
+    "venue_team_id",
+]
+
+CATEGORY_COLUMNS = ["game_id", "prev_game_id", "season", "position"]
+
+DATE_COLUMNS = ["game_date", "prev_game_date"]
+
+# Single-game maxima fit int8 except for points / shot attempts
+COUNT_DTYPES = {
+    "points": "int16",
+    "rebounds": "int8",
+    "assists": "int8",
+    "steals": "int8",
+    "blocks": "int8",
+    "turnovers": "int8",
+    "field_goals_made": "int8",
+    "field_goals_attempted": "int16",
+    "three_points_made": "int8",
+    "three_points_attempted": "int8",
+    "free_throws_made": "int8",
+    "free_throws_attempted": "int8",
+}
+
+DTYPES = {
+    **{c: "int32" for c in ID_COLUMNS},
+    **{c: "category" for c in CATEGORY_COLUMNS},
+    **{c: "datetime64" for c in DATE_COLUMNS},
+    **COUNT_DTYPES,
+}
+
+
+# ---------------------------
+# Casting
+# ---------------------------
+
+def cast(s: pd.Series, dtype: str) -> pd.Series:
+    """One column to a compact dtype ("object" leaves it as-is)."""
+    if dtype == "object":
+        return s
+    if dtype == "datetime64":
+        return s if pd.api.types.is_datetime64_any_dtype(s) else pd.to_datetime(s)
+    if dtype == "category":
+        return s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype("category")
+
+    if s.dtype == object:
+        # All-NULL or mixed columns come back from SQLite as objects
+        s = pd.to_numeric(s)
+    if dtype.startswith("int") and s.isna().any():
+        dtype = dtype.capitalize()
+    return s if s.dtype == dtype else s.astype(dtype)
+
+
+def compact(df: pd.DataFrame, defaults: dict | None = None) -> pd.DataFrame:
+    """
+    df with every column in its compact dtype. `defaults` gives a dtype
+    for columns DTYPES does not cover; other float64 columns become
+    float32 and anything else is left alone.
+    """
+    dtypes = {**(defaults or {}), **DTYPES}
+    cast_cols = {}
+    for col in df.columns:
+        dtype = dtypes.get(col)
+        if dtype is None and df[col].dtype == np.float64:
+            dtype = "float32"
+        if dtype is not None:
+            cast_cols[col] = cast(df[col], dtype)
+    return df.assign(**cast_cols)
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+# ---------------------------
+# Minutes
+# ---------------------------
+
+def parse_minutes(values, dtype: str = "float32") -> pd.Series:
+    """
+    Decimal minutes from "MM:SS" strings, numbers, or blanks (DNP -> 0),
+    for a whole column at once.
+    """
+    s = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(s):
+        return s.fillna(0).astype(dtype)
+
+    clock = s.astype("string").str.strip().str.split(":", n=1, expand=True)
+    clock = clock.reindex(columns=[0, 1])
+    # String columns parse to nullable Int64 when every value is whole
+    mm = pd.to_numeric(clock[0], errors="coerce").astype("float64")
+    ss = pd.to_numeric(clock[1], errors="coerce").astype("float64")
+
+    # "MM:SS" counts whole minutes and seconds; plain numbers pass through
+    minutes = mm.where(ss.isna(), np.trunc(mm) + np.trunc(ss) / 60)
+    return minutes.fillna(0).astype(dtype)
@@ -2,13 +2,32 @@
 import time
 import random
 import sqlite3
+import threading
 import pandas as pd
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
 from nba_api.stats.endpoints import ScoreboardV3, BoxScoreTraditionalV3
 from nba_api.stats.library.http import NBAStatsHTTP
 
+import api_cache
+import frame_dtypes
+import migrations
+import scoring
+from db import DB_PATH
 
-DB_PATH = "data/nba_forecasting.db"
+# stats.nba.com request budget: the old loop slept 0.6s per game,
+# so keep roughly the same sustained rate across all worker threads.
+REQUESTS_PER_SECOND = 1 / 0.6
+REQUEST_BURST = 2
+MAX_WORKERS = 4
+
+# Response cache policy (see api_cache.py)
+SCOREBOARD_TTL = 15 * 60
+BOXSCORE_LIVE_TTL = 5 * 60     # games not final yet (in progress / not started)
+FINAL_AFTER_DAYS = 2
+
+# ScoreboardV3 gameStatus: 1 scheduled, 2 in progress, 3 final
+GAME_STATUS_FINAL = 3
 
 
 # ============================================================
@@ -20,6 +39,42 @@ def log(msg: str):
     print(f"[{ts} UTC] {msg}", flush=True)
 
 
+# ============================================================
+# Rate Limiting
+# ============================================================
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Every API call takes one token, so any
+    number of worker threads share a single request budget.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+RATE_LIMITER = TokenBucket(REQUESTS_PER_SECOND, REQUEST_BURST)
+
+
 # ============================================================
 # Retry Wrappers
 # ============================================================
@@ -27,8 +82,10 @@ def log(msg: str):
 def retry_api_call(func, *args, retries=6, base_delay=2, **kwargs):
     """
     Generic retry wrapper for NBA API calls.
+    Each attempt (including retries) spends a rate-limiter token.
     """
     for attempt in range(1, retries + 1):
+        RATE_LIMITER.acquire()
         try:
             return func(*args, **kwargs)
         except Exception as e:
@@ -39,12 +96,29 @@ def retry_api_call(func, *args, retries=6, base_delay=2, **kwargs):
     raise RuntimeError(f"API call failed after {retries} retries.")
 
 
+def scoreboard_ttl(game_date):
+    """Recent scoreboards can still change; older ones are final."""
+    age = datetime.utcnow().date() - datetime.strptime(game_date, "%Y-%m-%d").date()
+    return api_cache.FOREVER if age.days >= FINAL_AFTER_DAYS else SCOREBOARD_TTL
+
+
 def safe_scoreboard(game_date):
-    return retry_api_call(ScoreboardV3, game_date=game_date)
+    return api_cache.cached_call(
+        "ScoreboardV3",
+        {"game_date": game_date},
+        lambda: retry_api_call(ScoreboardV3, game_date=game_date),
+        ttl=scoreboard_ttl(game_date),
+    )
 
 
-def safe_boxscore(game_id):
-    return retry_api_call(BoxScoreTraditionalV3, game_id=game_id)
+def safe_boxscore(game_id, ttl=api_cache.FOREVER):
+    """Final boxscores never change and are cached forever; pass a short ttl for other games."""
+    return api_cache.cached_call(
+        "BoxScoreTraditionalV3",
+        {"game_id": game_id},
+        lambda: retry_api_call(BoxScoreTraditionalV3, game_id=game_id),
+        ttl=ttl,
+    )
 
 
 # ============================================================
@@ -52,44 +126,10 @@ def safe_boxscore(game_id):
 # ============================================================
 
 def init_db():
+    """Create the tables, or migrate an existing DB to the current schema (migrations.py)."""
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
     con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
-
-    # Games table
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS games (
-            game_id TEXT PRIMARY KEY,
-            game_date TEXT,
-            home_team_id INTEGER,
-            away_team_id INTEGER
-        );
-    """)
-
-    # Boxscores table
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS boxscores (
-            game_id TEXT,
-            player_id INTEGER,
-            team_id INTEGER,
-            minutes REAL,
-            points INTEGER,
-            rebounds INTEGER,
-            assists INTEGER,
-            steals INTEGER,
-            blocks INTEGER,
-            turnovers INTEGER,
-            field_goals_made INTEGER,
-            field_goals_attempted INTEGER,
-            three_points_made INTEGER,
-            three_points_attempted INTEGER,
-            free_throws_made INTEGER,
-            free_throws_attempted INTEGER,
-            dk_fp REAL,
-            PRIMARY KEY (game_id, player_id)
-        );
-    """)
-
-    con.commit()
+    migrations.migrate(con)
     con.close()
 
 
@@ -97,22 +137,38 @@ def init_db():
 # Fetching Functions
 # ============================================================
 
+def final_games(header, date_str):
+    """
+    game_id -> whether the game is final, from the scoreboard's game
+    header. Without a status column, dates at least FINAL_AFTER_DAYS old
+    count as final.
+    """
+    if "gameStatus" in header.columns:
+        status = pd.to_numeric(header["gameStatus"], errors="coerce")
+        return dict(zip(header["gameId"], (status == GAME_STATUS_FINAL).tolist()))
+    is_old = scoreboard_ttl(date_str) is api_cache.FOREVER
+    return {gid: is_old for gid in header["gameId"]}
+
+
 def fetch_game_ids(date_str):
+    """(game ids, {game_id: is final}) for a date."""
     log(f"Fetching games for {date_str}...")
     sb = safe_scoreboard(date_str)
-    meta, linescore, *_ = sb.get_data_frames()
+    meta, header, *_ = sb.get_data_frames()
 
-    if "gameId" not in linescore.columns:
+    if "gameId" not in header.columns:
         raise RuntimeError(f"ScoreboardV3 did not return game list for {date_str}")
 
-    game_ids = list(linescore["gameId"].unique())
-    log(f"Found {len(game_ids)} games.")
-    return game_ids, linescore
+    game_ids = list(header["gameId"].unique())
+    final = final_games(header, date_str)
+    n_final = sum(final[g] for g in game_ids)
+    log(f"Found {len(game_ids)} games ({n_final} final).")
+    return game_ids, final
 
 
-def fetch_boxscore_and_teams(game_id):
+def fetch_boxscore_and_teams(game_id, final=True):
     log(f"  - Fetching boxscore {game_id}")
-    box = safe_boxscore(game_id)
+    box = safe_boxscore(game_id, ttl=api_cache.FOREVER if final else BOXSCORE_LIVE_TTL)
 
     dfs = box.get_data_frames()
     if len(dfs) == 0:
@@ -129,66 +185,264 @@ def fetch_boxscore_and_teams(game_id):
 
 
 # ============================================================
-# DB Insert Functions
+# Boxscore Preparation
 # ============================================================
 
-def upsert_game(game_id, date_str, home_team, away_team):
-    con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
-    cur.execute("""
-        INSERT OR REPLACE INTO games (game_id, game_date, home_team_id, away_team_id)
-        VALUES (?, ?, ?, ?);
-    """, (game_id, date_str, home_team, away_team))
-    con.commit()
-    con.close()
+# BoxScoreTraditionalV3 column -> boxscores table column
+BOXSCORE_COLUMNS = {
+    "gameId": "game_id",
+    "personId": "player_id",
+    "teamId": "team_id",
+    "minutes": "minutes",
+    "points": "points",
+    "reboundsTotal": "rebounds",
+    "assists": "assists",
+    "steals": "steals",
+    "blocks": "blocks",
+    "turnovers": "turnovers",
+    "fieldGoalsMade": "field_goals_made",
+    "fieldGoalsAttempted": "field_goals_attempted",
+    "threePointersMade": "three_points_made",
+    "threePointersAttempted": "three_points_attempted",
+    "freeThrowsMade": "free_throws_made",
+    "freeThrowsAttempted": "free_throws_attempted",
+}
+
+# opponent_team_id and game_date are denormalized from games; then fantasy
+# points for every site in scoring.SCORING_RULES (dk_fp, fd_fp, ...)
+BOXSCORE_TABLE_COLUMNS = (
+    list(BOXSCORE_COLUMNS.values())
+    + ["opponent_team_id", "game_date"]
+    + scoring.score_columns()
+)
+BOXSCORE_KEY_COLUMNS = ["game_id", "player_id"]
+
+# Idempotent write: re-ingesting a game overwrites its rows in place
+BOXSCORE_UPSERT_SQL = f"""
+    INSERT INTO boxscores ({", ".join(BOXSCORE_TABLE_COLUMNS)})
+    VALUES ({", ".join("?" for _ in BOXSCORE_TABLE_COLUMNS)})
+    ON CONFLICT ({", ".join(BOXSCORE_KEY_COLUMNS)}) DO UPDATE SET
+        {", ".join(f"{c} = excluded.{c}" for c in BOXSCORE_TABLE_COLUMNS if c not in BOXSCORE_KEY_COLUMNS)};
+"""
+
+
+def prepare_boxscores(df, game_date, home_team, away_team):
+    """Rename API columns to the table layout, parse minutes, and score every site."""
+    df = df.rename(columns=BOXSCORE_COLUMNS)
+    df = df.reindex(columns=BOXSCORE_TABLE_COLUMNS)
+    df["opponent_team_id"] = away_team
+    df.loc[df["team_id"] == away_team, "opponent_team_id"] = home_team
+    df["game_date"] = game_date
+
+    # float64 so the stored REAL is the exact decimal, not a float32 widening
+    df["minutes"] = frame_dtypes.parse_minutes(df["minutes"], dtype="float64")
+
+    scores = scoring.fantasy_scores(df)
+    df[scores.columns] = scores
+
+    # sqlite3 wants plain Python values with None for missing
+    return df.astype(object).where(df.notna(), None)
 
 
-def insert_boxscores(df):
-    con = sqlite3.connect(DB_PATH)
-    df = df.copy()
-
-    # Convert "minutes" to float (if "MM:SS" convert → decimal)
-    def parse_minutes(val):
-        if isinstance(val, str) and ":" in val:
-            mm, ss = val.split(":")
-            return int(mm) + int(ss) / 60
-        return float(val)
-
-    df["minutes"] = df["minutes"].apply(parse_minutes)
-
-    # Compute DraftKings FP
-    df["dk_fp"] = (
-        df["points"]
-        + 1.25 * df["rebounds"]
-        + 1.5 * df["assists"]
-        + 2 * df["steals"]
-        + 2 * df["blocks"]
-        - df["turnovers"]
-    )
+# ============================================================
+# Ingestion Writer
+# ============================================================
+
+class IngestWriter:
+    """
+    Single long-lived SQLite connection for ingestion.
+
+    Games and boxscore rows are buffered per date and written, together
+    with their checkpoints, in one executemany transaction per date. Only
+    final games are checkpointed; the rest are re-fetched on the next run.
+    Every write stamps games.updated_at, which is how the feature build
+    and dvp.py find games whose rows changed after they last ran.
+    WAL + synchronous=NORMAL turns several full commits per game into
+    one cheap commit per date.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.con = sqlite3.connect(db_path)
+        self.con.execute("PRAGMA journal_mode=WAL;")
+        self.con.execute("PRAGMA synchronous=NORMAL;")
+        self.con.execute("PRAGMA cache_size=-65536;")   # 64 MB page cache
+        self.con.execute("PRAGMA temp_store=MEMORY;")
+        self.pending = {}   # date -> [(game_id, home, away, final, prepared boxscore df)]
+
+    def add_game(self, date_str, game_id, home_team, away_team, df_box, final=True):
+        self.pending.setdefault(date_str, []).append(
+            (game_id, home_team, away_team, final,
+             prepare_boxscores(df_box, date_str, home_team, away_team))
+        )
+
+    def flush(self, date_str, n_games=None):
+        """
+        Write everything buffered for date_str in one transaction.
+        When n_games is given the date itself is checkpointed as complete
+        (only pass it once every game of the date is final).
+        """
+        games = self.pending.pop(date_str, [])
+        now = datetime.utcnow().isoformat()
+
+        game_rows = [(gid, date_str, home, away, now) for gid, home, away, *_ in games]
+        checkpoint_rows = [(gid, date_str, now) for gid, _, _, final, _ in games if final]
+        box_rows = [
+            row
+            for *_, df in games
+            for row in df.itertuples(index=False, name=None)
+        ]
+
+        with self.con:
+            self.con.executemany("""
+                INSERT INTO games (game_id, game_date, home_team_id, away_team_id, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (game_id) DO UPDATE SET
+                    game_date = excluded.game_date,
+                    home_team_id = excluded.home_team_id,
+                    away_team_id = excluded.away_team_id,
+                    updated_at = excluded.updated_at;
+            """, game_rows)
+            self.con.executemany(BOXSCORE_UPSERT_SQL, box_rows)
+            self.con.executemany("""
+                INSERT OR REPLACE INTO ingest_checkpoints (game_id, game_date, completed_at)
+                VALUES (?, ?, ?);
+            """, checkpoint_rows)
+            if n_games is not None:
+                self.con.execute("""
+                    INSERT OR REPLACE INTO ingest_checkpoint_dates (game_date, n_games, completed_at)
+                    VALUES (?, ?, ?);
+                """, (date_str, n_games, now))
+
+        return len(game_rows), len(box_rows)
+
+    def close(self):
+        for date_str in list(self.pending):
+            self.flush(date_str)
+        self.con.close()
+
+
+# ============================================================
+# Checkpoints
+# ============================================================
 
-    df.to_sql("boxscores", con, if_exists="append", index=False)
+def load_checkpoints():
+    """Return (completed game_ids, completed dates)."""
+    con = sqlite3.connect(DB_PATH)
+    cur = con.cursor()
+    games = {row[0] for row in cur.execute("SELECT game_id FROM ingest_checkpoints;")}
+    dates = {row[0] for row in cur.execute("SELECT game_date FROM ingest_checkpoint_dates;")}
     con.close()
+    return games, dates
 
 
 # ============================================================
-# Master Ingestion Function
+# Master Ingestion Functions
 # ============================================================
 
-def ingest_date(date_str):
-    init_db()
-    game_ids, meta = fetch_game_ids(date_str)
+def date_range(start_str, end_str):
+    start = datetime.strptime(start_str, "%Y-%m-%d").date()
+    end = datetime.strptime(end_str, "%Y-%m-%d").date()
+    if end < start:
+        raise ValueError(f"End date {end_str} is before start date {start_str}")
 
-    for gid in game_ids:
-        try:
-            df_box, t1, t2 = fetch_boxscore_and_teams(gid)
-            upsert_game(gid, date_str, t1, t2)
-            insert_boxscores(df_box)
-            time.sleep(0.6)
+    day = start
+    while day <= end:
+        yield day.strftime("%Y-%m-%d")
+        day += timedelta(days=1)
 
-        except Exception as e:
-            log(f"[ERROR] Failed to process game {gid}: {e}")
 
-    log(f"Done ingesting {date_str}!")
+def backfill(start_str, end_str, workers=MAX_WORKERS, resume=True):
+    """
+    Ingest every date in [start_str, end_str] on one bounded thread pool.
+
+    Scoreboard and boxscore requests for all dates overlap on the pool and
+    share RATE_LIMITER. All writes go through one IngestWriter on the
+    calling thread, one transaction per date. With resume=True,
+    checkpointed dates and games are skipped, so a crashed backfill picks
+    up where it stopped. Games that were not final when fetched are not
+    checkpointed, and neither is their date. Raises RuntimeError after
+    the pool drains if any scoreboard or boxscore failed.
+    """
+    init_db()
+    done_games, done_dates = load_checkpoints() if resume else (set(), set())
+
+    dates = [d for d in date_range(start_str, end_str) if d not in done_dates]
+    log(f"Backfilling {len(dates)} dates ({start_str} → {end_str}), "
+        f"{len(done_games)} games already checkpointed.")
+
+    remaining = {}      # date -> boxscores still in flight
+    totals = {}         # date -> games on the scoreboard
+    failed = set()      # dates whose scoreboard or at least one game failed
+    unfinished = set()  # dates with at least one game not final yet
+    is_final = {}       # game_id -> final on its scoreboard
+
+    writer = IngestWriter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            pending = {pool.submit(fetch_game_ids, d): ("scoreboard", d, None) for d in dates}
+
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    kind, date_str, gid = pending.pop(future)
+
+                    if kind == "scoreboard":
+                        try:
+                            game_ids, final = future.result()
+                        except Exception as e:
+                            log(f"[ERROR] Failed to fetch scoreboard for {date_str}: {e}")
+                            failed.add(date_str)
+                            continue
+
+                        is_final.update(final)
+                        todo = [g for g in game_ids if g not in done_games]
+                        totals[date_str] = len(game_ids)
+                        if not all(final[g] for g in game_ids):
+                            unfinished.add(date_str)
+                        remaining[date_str] = len(todo)
+                        for g in todo:
+                            pending[pool.submit(fetch_boxscore_and_teams, g, final[g])] = (
+                                "boxscore", date_str, g
+                            )
+
+                    else:
+                        try:
+                            df_box, t1, t2 = future.result()
+                            writer.add_game(date_str, gid, t1, t2, df_box, final=is_final[gid])
+                        except Exception as e:
+                            log(f"[ERROR] Failed to process game {gid}: {e}")
+                            failed.add(date_str)
+                        remaining[date_str] -= 1
+
+                    if remaining.get(date_str) == 0:
+                        complete = date_str not in failed and date_str not in unfinished
+                        n_written, n_rows = writer.flush(
+                            date_str, totals[date_str] if complete else None
+                        )
+                        log(f"Done ingesting {date_str}: {n_written} games, {n_rows} player rows.")
+    finally:
+        writer.close()
+
+    if unfinished:
+        log(f"{len(unfinished)} dates had games that were not final yet and will be re-fetched "
+            f"on the next run: {', '.join(sorted(unfinished))}")
+    if failed:
+        # Everything that did succeed is written; fail the run so callers
+        # (run_daily_pipeline, cron) see the gap instead of a clean exit
+        raise RuntimeError(
+            f"{len(failed)} dates had failures and are not checkpointed; re-run to retry: "
+            f"{', '.join(sorted(failed))}"
+        )
+
+
+def ingest_date(date_str, workers=MAX_WORKERS, resume=True):
+    """
+    Fetch every boxscore for a date on a bounded thread pool.
+    Requests overlap but share RATE_LIMITER; all DB writes happen
+    on the calling thread so SQLite only ever sees one writer.
+    """
+    backfill(date_str, date_str, workers=workers, resume=resume)
 
 
 # ============================================================
@@ -196,8 +450,25 @@ def ingest_date(date_str):
 # ============================================================
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) < 2:
-        raise RuntimeError("Usage: python ingest_boxscores.py YYYY-MM-DD")
-
-    ingest_date(sys.argv[1])
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingest NBA boxscores into SQLite.")
+    parser.add_argument("date", nargs="?", help="Single date to ingest (YYYY-MM-DD)")
+    parser.add_argument("--start", help="First date of a backfill range (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last date of a backfill range (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Concurrent API requests")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore checkpoints and re-fetch everything")
+    parser.add_argument("--offline", action="store_true", help="Replay from the API response cache only")
+    args = parser.parse_args()
+
+    if args.offline:
+        api_cache.OFFLINE = True
+
+    if args.start or args.end:
+        if not (args.start and args.end):
+            parser.error("--start and --end must be given together")
+        backfill(args.start, args.end, workers=args.workers, resume=not args.no_resume)
+    elif args.date:
+        ingest_date(args.date, workers=args.workers, resume=not args.no_resume)
+    else:
+        parser.error("Usage: python ingest_boxscores.py YYYY-MM-DD | --start YYYY-MM-DD --end YYYY-MM-DD")
@@ -0,0 +1,313 @@
+# src/migrations.py
+
+"""
+migrations.py
+
+Versioned schema migrations for the SQLite database.
+
+Every entry point that opens the DB (db.init_db, ingest_boxscores.init_db,
+the feature build, synthetic.py) calls migrate(), which applies the
+pending steps in MIGRATIONS in order and records each one in
+schema_version. Each step runs in its own BEGIN IMMEDIATE transaction, so
+a failed step leaves the DB at the previous version and concurrent
+processes cannot apply the same step twice.
+
+Older databases come in two boxscores layouts:
+    - sql/schema.sql: autoincrement id, opponent_team_id NOT NULL, no
+      shooting or fantasy columns, no uniqueness on (game_id, player_id)
+    - ingest_boxscores.py: composite primary key, shooting columns, dk_fp
+Both are rebuilt in place into the canonical layout below (duplicate
+(game_id, player_id) rows keep the newest copy).
+
+Canonical boxscores:
+    PRIMARY KEY (game_id, player_id), game_date and opponent_team_id
+    denormalized from games, shooting splits, <site>_fp scores, and
+    (player_id, game_date) / (team_id, game_date) covering indexes.
+
+Usage:
+    python src/migrations.py            # migrate the DB at db.DB_PATH
+    python src/migrations.py --status
+"""
+
+from datetime import datetime
+
+import scoring
+
+# ---------------------------
+# Canonical tables
+# ---------------------------
+
+BASE_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS teams (
+        team_id        INTEGER PRIMARY KEY,
+        team_name      TEXT NOT NULL,
+        team_abbrev    TEXT NOT NULL,
+        team_nickname  TEXT,
+        team_city      TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS players (
+        player_id   INTEGER PRIMARY KEY,
+        full_name   TEXT NOT NULL,
+        first_name  TEXT,
+        last_name   TEXT,
+        is_active   INTEGER NOT NULL,
+        team_id     INTEGER,
+        FOREIGN KEY (team_id) REFERENCES teams(team_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS games (
+        game_id        TEXT PRIMARY KEY,
+        season         TEXT,
+        game_date      TEXT,
+        home_team_id   INTEGER,
+        away_team_id   INTEGER
+    );
+
+    CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+        game_id TEXT PRIMARY KEY,
+        game_date TEXT,
+        completed_at TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS ingest_checkpoint_dates (
+        game_date TEXT PRIMARY KEY,
+        n_games INTEGER,
+        completed_at TEXT
+    );
+"""
+
+# (column, type) in table order
+BOXSCORE_COLUMNS = [
+    ("game_id", "TEXT NOT NULL"),
+    ("player_id", "INTEGER NOT NULL"),
+    ("team_id", "INTEGER NOT NULL"),
+    ("opponent_team_id", "INTEGER"),
+    ("game_date", "TEXT"),
+    ("minutes", "REAL"),
+    ("points", "INTEGER"),
+    ("rebounds", "INTEGER"),
+    ("assists", "INTEGER"),
+    ("steals", "INTEGER"),
+    ("blocks", "INTEGER"),
+    ("turnovers", "INTEGER"),
+    ("field_goals_made", "INTEGER"),
+    ("field_goals_attempted", "INTEGER"),
+    ("three_points_made", "INTEGER"),
+    ("three_points_attempted", "INTEGER"),
+    ("free_throws_made", "INTEGER"),
+    ("free_throws_attempted", "INTEGER"),
+    ("dk_fp", "REAL"),
+    ("fd_fp", "REAL"),
+    ("yahoo_fp", "REAL"),
+]
+BOXSCORE_KEY = ["game_id", "player_id"]
+
+# Per-player and per-team history in date order; game_id is carried so
+# "which games did X play in a date range" is answered from the index alone.
+INDEXES = {
+    "idx_boxscores_player_date": "boxscores(player_id, game_date, game_id)",
+    "idx_boxscores_team_date": "boxscores(team_id, game_date, game_id)",
+    "idx_games_date": "games(game_date)",
+}
+
+# Covered by the primary key or the date indexes above
+REDUNDANT_INDEXES = ["idx_boxscores_player", "idx_boxscores_game", "idx_boxscores_game_player"]
+
+
+def boxscores_sql(table: str = "boxscores") -> str:
+    cols = ",\n        ".join(f"{name} {kind}" for name, kind in BOXSCORE_COLUMNS)
+    return f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        {cols},
+        PRIMARY KEY ({", ".join(BOXSCORE_KEY)})
+    );
+"""
+
+
+def execute_script(conn, script: str):
+    """
+    Run a multi-statement script inside the caller's transaction
+    (sqlite3's executescript() would commit it first).
+    """
+    for statement in script.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def table_info(conn, table: str) -> list:
+    """[(name, pk position)] for a table; empty if it does not exist."""
+    return [(row[1], row[5]) for row in conn.execute(f"PRAGMA table_info({table});")]
+
+
+# ---------------------------
+# Steps
+# ---------------------------
+
+def create_base_tables(conn):
+    execute_script(conn, BASE_TABLES_SQL)
+
+
+def add_games_season(conn):
+    # ingest_boxscores.py used to create games without a season column
+    if "season" not in dict(table_info(conn, "games")):
+        conn.execute("ALTER TABLE games ADD COLUMN season TEXT;")
+
+
+def reconcile_boxscores(conn):
+    """Rebuild boxscores into the canonical layout, keeping every row."""
+    info = table_info(conn, "boxscores")
+    if not info:
+        conn.execute(boxscores_sql())
+        return
+
+    existing = dict(info)
+    key = [name for name, pk in sorted(info, key=lambda c: c[1]) if pk]
+    canonical = [name for name, _ in BOXSCORE_COLUMNS]
+    if key == BOXSCORE_KEY and all(c in existing for c in canonical):
+        return
+
+    common = ", ".join(c for c in canonical if c in existing)
+    conn.execute("DROP TABLE IF EXISTS boxscores_canonical;")
+    conn.execute(boxscores_sql("boxscores_canonical"))
+    conn.execute(f"""
+        INSERT INTO boxscores_canonical ({common})
+        SELECT {common} FROM boxscores
+        WHERE rowid IN (SELECT MAX(rowid) FROM boxscores GROUP BY game_id, player_id);
+    """)
+    conn.execute("DROP TABLE boxscores;")
+    conn.execute("ALTER TABLE boxscores_canonical RENAME TO boxscores;")
+
+
+def backfill_boxscores(conn):
+    """Fill game_date / opponent_team_id from games and rescore every row."""
+    conn.execute("""
+        UPDATE boxscores
+        SET game_date = COALESCE(game_date, (
+                SELECT g.game_date FROM games g WHERE g.game_id = boxscores.game_id
+            )),
+            opponent_team_id = COALESCE(opponent_team_id, (
+                SELECT CASE WHEN boxscores.team_id = g.home_team_id
+                            THEN g.away_team_id ELSE g.home_team_id END
+                FROM games g WHERE g.game_id = boxscores.game_id
+            ))
+        WHERE game_date IS NULL OR opponent_team_id IS NULL;
+    """)
+    # Older layouts had no scores, or dk_fp under earlier DraftKings rules
+    scoring.rescore(conn)
+
+
+def create_indexes(conn):
+    for name in REDUNDANT_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name};")
+    for name, target in INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target};")
+
+
+def add_games_updated_at(conn):
+    # Set by ingest_boxscores.IngestWriter on every write of a game, so the
+    # feature build and dvp.py can find games rewritten after they ran
+    if "updated_at" not in dict(table_info(conn, "games")):
+        conn.execute("ALTER TABLE games ADD COLUMN updated_at TEXT;")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_games_updated ON games(updated_at);")
+
+
+def create_player_meta(conn):
+    # Positions cached by dvp.refresh_player_meta (source: nba_api or stats)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS player_meta (
+            player_id   INTEGER PRIMARY KEY,
+            position    TEXT,
+            source      TEXT,
+            updated_at  TEXT
+        );
+    """)
+
+
+# (version, description, step); append only, never renumber
+MIGRATIONS = [
+    (1, "base tables", create_base_tables),
+    (2, "games.season column", add_games_season),
+    (3, "canonical boxscores layout", reconcile_boxscores),
+    (4, "backfill boxscores game_date, opponent_team_id and scores", backfill_boxscores),
+    (5, "date-ordered covering indexes", create_indexes),
+    (6, "player_meta table", create_player_meta),
+    (7, "games.updated_at change marker", add_games_updated_at),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+
+def current_version(conn) -> int:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version     INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at  TEXT
+        );
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_version;").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn, verbose: bool = True) -> int:
+    """
+    Apply every pending migration, then add score columns for sites
+    registered after the last one (see scoring.register_rules).
+    Returns the schema version.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    version = current_version(conn)
+
+    for step_version, description, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            # Another process may have migrated while we waited for the lock
+            if current_version(conn) >= step_version:
+                conn.rollback()
+                continue
+            step(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?);",
+                (step_version, description, datetime.utcnow().isoformat()),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if verbose:
+            print(f"Applied migration {step_version}: {description}")
+        version = step_version
+
+    if scoring.ensure_score_columns(conn):
+        scoring.rescore(conn)
+        conn.commit()
+    return version
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from db import DB_PATH, get_connection
+
+    parser = argparse.ArgumentParser(description="Apply schema migrations to the SQLite DB.")
+    parser.add_argument("--status", action="store_true", help="Show applied migrations only")
+    args = parser.parse_args()
+
+    with get_connection() as conn:
+        if not args.status:
+            migrate(conn)
+        applied = conn.execute(
+            "SELECT version, description, applied_at FROM schema_version ORDER BY version;"
+        ).fetchall()
+
+    print(f"{DB_PATH}: schema version {applied[-1][0] if applied else 0} of {LATEST_VERSION}")
+    for version, description, applied_at in applied:
+        print(f"  {version:>3}  {applied_at}  {description}")
@@ -4,42 +4,45 @@
 model_minutes.py
 
 Trains a simple linear regression model to predict minutes played.
-Saves the model to models/minutes_model.pkl
+Saves the model to models/minutes_model.pkl and registers a new version
+in the model registry.
 """
 
+import os
 from pathlib import Path
 
 import pandas as pd
 from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split
 import joblib
 
+import model_registry
+from build_model_dataset import time_split_cutoff
+from dataset_store import load_dataset
+
 BASE_DIR = Path(__file__).resolve().parents[1]
-PROCESSED_DIR = BASE_DIR / "data" / "processed"
-MODELS_DIR = BASE_DIR / "models"
+MODELS_DIR = Path(os.getenv("NBA_MODELS_DIR", BASE_DIR / "models"))
 MODELS_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def main():
-    data_path = PROCESSED_DIR / "model_dataset.csv"
-    df = pd.read_csv(data_path, parse_dates=["game_date"])
-
-    feature_cols = [
-        "minutes_last_5",
-        "minutes_last_10",
-        "minutes_last_20",
-        "fppg_last_10",
-        "fppg_last_20",
-        "usage_proxy",
-        "dvp_last_20",
-    ]
-
-    X = df[feature_cols]
-    y = df["minutes"]
-
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
+FEATURE_COLS = [
+    "minutes_last_5",
+    "minutes_last_10",
+    "minutes_last_20",
+    "fppg_last_10",
+    "fppg_last_20",
+    "usage_proxy",
+    "dvp_last_20",
+]
+
+
+def train(df: pd.DataFrame) -> LinearRegression:
+    # Early-career rows don't have full rolling windows yet
+    df = df.dropna(subset=FEATURE_COLS + ["minutes"])
+
+    # Time-based split: fit on older games, score on the most recent ones
+    train_rows = df["game_date"] <= time_split_cutoff(df["game_date"])
+    X_train, y_train = df.loc[train_rows, FEATURE_COLS], df.loc[train_rows, "minutes"]
+    X_test, y_test = df.loc[~train_rows, FEATURE_COLS], df.loc[~train_rows, "minutes"]
 
     model = LinearRegression()
     model.fit(X_train, y_train)
@@ -53,6 +56,19 @@ def main():
     joblib.dump(model, model_path)
     print(f"Saved minutes model to {model_path}")
 
+    trained_through = df.loc[train_rows, "game_date"].max()
+    version = model_registry.save_model(
+        "minutes_model", model, FEATURE_COLS, trained_through,
+        metrics={"r2_train": train_score, "r2_test": test_score},
+    )
+    print(f"Registered minutes_model {version}")
+    return model
+
+
+def main():
+    df = load_dataset("model_dataset", columns=["game_date"] + FEATURE_COLS + ["minutes"])
+    train(df)
+
 
 if __name__ == "__main__":
     main()
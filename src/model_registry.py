@@ -0,0 +1,193 @@
+# src/model_registry.py
+
+"""
+model_registry.py
+
+Versioned, fast-loading model artifacts for projection.
+
+Each save creates models/registry/<name>/vNNNN/ with a meta.json
+(feature list, training cutoff, metrics, ...) and bumps
+models/registry/<name>/LATEST.
+
+Random forests are exported as flat tree arrays: one .npy per node field
+(children, split feature, threshold, leaf value) concatenated across all
+trees. Loading memory-maps those files, so startup is a handful of
+np.load calls instead of unpickling thousands of Tree objects, and
+several worker processes reading the same version share one copy in the
+OS page cache. Other models are stored as compressed joblib pickles.
+
+The .pkl files written by the training scripts stay as the training
+state (warm starts need the full sklearn objects); the registry is the
+serving format.
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+REGISTRY_DIR = Path(os.getenv("NBA_MODELS_DIR", BASE_DIR / "models")) / "registry"
+
+KEEP_VERSIONS = int(os.getenv("NBA_REGISTRY_KEEP", "10"))
+
+FOREST_FIELDS = ["roots", "children_left", "children_right", "feature", "threshold", "value"]
+
+
+# ---------------------------
+# Flat forest
+# ---------------------------
+
+class FlatForest:
+    """
+    Array-backed stand-in for a fitted single-output RandomForestRegressor.
+    All trees are walked together, one tree level per NumPy step.
+    """
+
+    def __init__(self, arrays: dict, feature_names):
+        self.roots = arrays["roots"]
+        self.children_left = arrays["children_left"]
+        self.children_right = arrays["children_right"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.value = arrays["value"]
+        self.feature_names_in_ = np.array(feature_names, dtype=object)
+        self.n_features_in_ = len(feature_names)
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model: RandomForestRegressor, feature_names):
+        parts = {f: [] for f in FOREST_FIELDS if f != "roots"}
+        roots = []
+        offset = 0
+
+        for est in model.estimators_:
+            tree = est.tree_
+            left = tree.children_left.astype(np.int32)
+            right = tree.children_right.astype(np.int32)
+
+            roots.append(offset)
+            parts["children_left"].append(np.where(left >= 0, left + offset, -1))
+            parts["children_right"].append(np.where(right >= 0, right + offset, -1))
+            parts["feature"].append(tree.feature.astype(np.int32))
+            # sklearn compares float32 inputs against float64 thresholds;
+            # keep both thresholds and leaf values exact.
+            parts["threshold"].append(tree.threshold.astype(np.float64))
+            parts["value"].append(tree.value[:, 0, 0].astype(np.float64))
+            offset += tree.node_count
+
+        arrays = {f: np.concatenate(v).astype(v[0].dtype) for f, v in parts.items()}
+        arrays["roots"] = np.array(roots, dtype=np.int32)
+        return cls(arrays, feature_names)
+
+    def _as_array(self, X):
+        if isinstance(X, pd.DataFrame):
+            X = X[list(self.feature_names_in_)].to_numpy()
+        return np.asarray(X, dtype=np.float32)
+
+    def predict_per_tree(self, X) -> np.ndarray:
+        """(n_trees, n_samples) predictions, one row per tree."""
+        X = self._as_array(X)
+        n = len(X)
+        nodes = np.repeat(self.roots[:, None], n, axis=1)
+        rows = np.broadcast_to(np.arange(n), nodes.shape)
+
+        while True:
+            left = self.children_left[nodes]
+            inner = left >= 0
+            if not inner.any():
+                break
+            go_left = X[rows, np.where(inner, self.feature[nodes], 0)] <= self.threshold[nodes]
+            nodes = np.where(inner, np.where(go_left, left, self.children_right[nodes]), nodes)
+
+        return self.value[nodes]
+
+    def predict(self, X) -> np.ndarray:
+        return self.predict_per_tree(X).mean(axis=0)
+
+
+# ---------------------------
+# Save / load
+# ---------------------------
+
+def latest_version(name: str):
+    try:
+        return (REGISTRY_DIR / name / "LATEST").read_text().strip()
+    except FileNotFoundError:
+        return None
+
+
+def save_model(name: str, model, feature_cols, trained_through=None, metrics=None) -> str:
+    """Write a new version of `name` and point LATEST at it."""
+    model_dir = REGISTRY_DIR / name
+    model_dir.mkdir(parents=True, exist_ok=True)
+
+    existing = sorted(p.name for p in model_dir.glob("v*") if p.is_dir())
+    version = f"v{int(existing[-1][1:]) + 1:04d}" if existing else "v0001"
+    out = model_dir / version
+    out.mkdir()
+
+    meta = {
+        "name": name,
+        "version": version,
+        "feature_cols": list(feature_cols),
+        "trained_through": str(trained_through) if trained_through is not None else None,
+        "metrics": metrics or {},
+        "created_at": datetime.utcnow().isoformat(),
+        "model_class": type(model).__name__,
+    }
+
+    if isinstance(model, RandomForestRegressor) and model.n_outputs_ == 1:
+        flat = FlatForest.from_sklearn(model, feature_cols)
+        for field in FOREST_FIELDS:
+            np.save(out / f"{field}.npy", getattr(flat, field))
+        meta.update({"format": "flat_forest", "n_trees": flat.n_estimators})
+    else:
+        joblib.dump(model, out / "model.joblib", compress=3)
+        meta["format"] = "joblib"
+
+    (out / "meta.json").write_text(json.dumps(meta, indent=2))
+
+    # Atomic pointer swap so readers never see a half-written version
+    tmp = model_dir / "LATEST.tmp"
+    tmp.write_text(version)
+    os.replace(tmp, model_dir / "LATEST")
+
+    prune(name)
+    return version
+
+
+def prune(name: str, keep: int = KEEP_VERSIONS) -> None:
+    """Delete all but the newest `keep` versions of a model."""
+    versions = sorted(p for p in (REGISTRY_DIR / name).glob("v*") if p.is_dir())
+    for old in versions[:-keep] if keep > 0 else []:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def load_meta(name: str, version: str | None = None) -> dict:
+    version = version or latest_version(name)
+    if version is None:
+        raise FileNotFoundError(f"No registered versions of {name}")
+    return json.loads((REGISTRY_DIR / name / version / "meta.json").read_text())
+
+
+def load_model(name: str, version: str | None = None, mmap: bool = True):
+    """Load a registered model (LATEST by default)."""
+    meta = load_meta(name, version)
+    path = REGISTRY_DIR / name / meta["version"]
+
+    if meta["format"] == "flat_forest":
+        mode = "r" if mmap else None
+        arrays = {f: np.load(path / f"{f}.npy", mmap_mode=mode) for f in FOREST_FIELDS}
+        return FlatForest(arrays, meta["feature_cols"])
+
+    return joblib.load(path / "model.joblib")
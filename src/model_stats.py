@@ -9,71 +9,141 @@ Trains RandomForest models for:
     - assists
     - fantasy_points
 
-Saves models under models/ directory.
+Saves models under models/ directory and registers a new version of each
+in the model registry.
+
+The feature matrix and train/test split are built once and shared by all
+targets, which train in parallel (see train_all).
 """
 
 from pathlib import Path
 
+import os
+
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
 import joblib
+from joblib import Parallel, delayed
+
+import model_registry
+from build_model_dataset import time_split_cutoff
+from dataset_store import load_dataset
 
 BASE_DIR = Path(__file__).resolve().parents[1]
-PROCESSED_DIR = BASE_DIR / "data" / "processed"
-MODELS_DIR = BASE_DIR / "models"
+MODELS_DIR = Path(os.getenv("NBA_MODELS_DIR", BASE_DIR / "models"))
 MODELS_DIR.mkdir(parents=True, exist_ok=True)
 
-
-def train_and_save(df: pd.DataFrame, target: str, feature_cols, model_name: str):
-    X = df[feature_cols]
-    y = df[target]
-
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
+# Core budget for training (default: every core on the machine)
+TRAIN_CORES = int(os.getenv("NBA_TRAIN_CORES", os.cpu_count() or 1))
+
+
+FEATURE_COLS = [
+    "minutes_last_5",
+    "minutes_last_10",
+    "minutes_last_20",
+    "fppg_last_5",
+    "fppg_last_10",
+    "fppg_last_20",
+    "points_last_10",
+    "rebounds_last_10",
+    "assists_last_10",
+    "usage_proxy",
+    "dvp_last_20",
+]
+
+TARGETS = [
+    ("points", "points_model"),
+    ("rebounds", "rebounds_model"),
+    ("assists", "assists_model"),
+    ("fantasy_points", "fantasy_model"),
+]
+
+
+def build_matrix(df: pd.DataFrame):
+    """
+    Shared preprocessing for every target: drop incomplete rows once, build
+    one contiguous float32 feature matrix, and split it once by time
+    (older games train, the most recent ones test).
+
+    Returns X_train, X_test, Y_train, Y_test and the cutoff date.
+    """
+    target_cols = [t for t, _ in TARGETS]
+
+    # Early-career rows don't have full rolling windows yet
+    df = df.dropna(subset=FEATURE_COLS + target_cols).sort_values("game_date")
+
+    X = np.ascontiguousarray(df[FEATURE_COLS].to_numpy(dtype=np.float32))
+    Y = df[target_cols].to_numpy(dtype=np.float64)
+
+    # Rows are in date order, so the split is a slice
+    cutoff = time_split_cutoff(df["game_date"])
+    n_train = int((df["game_date"] <= cutoff).sum())
+    return X[:n_train], X[n_train:], Y[:n_train], Y[n_train:], cutoff
+
+
+def new_forest(n_jobs: int = 1) -> RandomForestRegressor:
+    return RandomForestRegressor(
+        n_estimators=200, max_depth=10, random_state=42, n_jobs=n_jobs
     )
 
-    model = RandomForestRegressor(
-        n_estimators=200, max_depth=10, random_state=42, n_jobs=-1
-    )
+
+def fit_target(X_train, y_train, X_test, y_test, target: str, n_jobs: int):
+    model = new_forest(n_jobs)
     model.fit(X_train, y_train)
 
     train_score = model.score(X_train, y_train)
     test_score = model.score(X_test, y_test)
+    test_mae = float(np.mean(np.abs(model.predict(X_test) - y_test)))
 
-    print(f"{target} model R^2 - train: {train_score:.3f}, test: {test_score:.3f}")
+    # Fit on a bare array; record the column names so callers can
+    # still select features by name (see projection_engine.project).
+    model.feature_names_in_ = np.array(FEATURE_COLS, dtype=object)
 
-    model_path = MODELS_DIR / f"{model_name}.pkl"
-    joblib.dump(model, model_path)
-    print(f"Saved {target} model to {model_path}")
+    print(f"{target} model R^2 - train: {train_score:.3f}, test: {test_score:.3f}", flush=True)
+    return model, {"r2_train": train_score, "r2_test": test_score, "mae_test": test_mae}
 
 
-def main():
-    data_path = PROCESSED_DIR / "model_dataset.csv"
-    df = pd.read_csv(data_path, parse_dates=["game_date"])
+def train_all(df: pd.DataFrame, cores: int = TRAIN_CORES) -> dict:
+    """
+    Train every stats model; returns {model_name: model}.
 
-    feature_cols = [
-        "minutes_last_5",
-        "minutes_last_10",
-        "minutes_last_20",
-        "fppg_last_5",
-        "fppg_last_10",
-        "fppg_last_20",
-        "points_last_10",
-        "rebounds_last_10",
-        "assists_last_10",
-        "usage_proxy",
-        "dvp_last_20",
-    ]
+    Targets are fanned out over a process pool (joblib/loky memory-maps the
+    shared feature matrix into the workers instead of copying it), and the
+    core budget is split between the pool and each forest's own n_jobs.
+    """
+    X_train, X_test, Y_train, Y_test, trained_through = build_matrix(df)
 
-    for target, name in [
-        ("points", "points_model"),
-        ("rebounds", "rebounds_model"),
-        ("assists", "assists_model"),
-        ("fantasy_points", "fantasy_model"),
-    ]:
-        train_and_save(df, target, feature_cols, name)
+    cores = max(1, cores)
+    workers = min(len(TARGETS), cores)
+    jobs_per_fit = max(1, cores // workers)
+
+    results = Parallel(n_jobs=workers)(
+        delayed(fit_target)(X_train, Y_train[:, i], X_test, Y_test[:, i], target, jobs_per_fit)
+        for i, (target, _) in enumerate(TARGETS)
+    )
+
+    out = {}
+    for (target, name), (model, metrics) in zip(TARGETS, results):
+        model_path = MODELS_DIR / f"{name}.pkl"
+        joblib.dump(model, model_path)
+        version = model_registry.save_model(name, model, FEATURE_COLS, trained_through, metrics)
+        print(f"Saved {target} model to {model_path} (registered {version})")
+        out[name] = model
+    return out
+
+
+def main(cores: int = TRAIN_CORES):
+    df = load_dataset("model_dataset", columns=["game_date"] + FEATURE_COLS + [t for t, _ in TARGETS])
+    train_all(df, cores=cores)
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the stats models.")
+    parser.add_argument("--cores", type=int, default=TRAIN_CORES,
+                        help="Total CPU cores to use across all targets")
+    args = parser.parse_args()
+
+    main(cores=args.cores)
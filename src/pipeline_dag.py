@@ -0,0 +1,216 @@
+"""
+pipeline_dag.py
+
+In-process stage-graph runner.
+
+Each Stage declares the artifacts it consumes (inputs) and produces
+(outputs). Stages run in one process and hand DataFrames / models to each
+other in memory. Independent stages run in parallel on a thread pool.
+
+A stage is skipped when the hash of its inputs (plus params) matches the
+previous run and it has a `load` function that can recover its outputs
+from disk. Outputs of always-run stages (ingestion, DB fingerprint) are
+content-hashed; every other output is identified by the key of the stage
+that produced it, so large DataFrames and models are never re-hashed.
+Keys are kept in pipeline_state.json under the output directory
+(NBA_OUTPUT_DIR, default outputs/).
+
+After the run a per-stage timing report is printed, with the peak RSS of
+the whole process: stages share the process and run in parallel, so a
+per-stage memory figure would include whatever ran alongside.
+"""
+
+import json
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+import joblib
+import pandas as pd
+
+from dataset_store import OUTPUT_DIR
+
+STATE_PATH = OUTPUT_DIR / "pipeline_state.json"
+
+
+class Stage:
+    """
+    One pipeline step.
+
+    func(**inputs) -> {output_name: value}
+    load() -> {output_name: value}, used instead of func when skipped
+    always_run: never skip (e.g. network ingestion)
+    allow_failure: log the error and publish `None` outputs instead of
+                   aborting the pipeline
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), params=None,
+                 load=None, always_run=False, allow_failure=False):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.load = load
+        self.always_run = always_run
+        self.allow_failure = allow_failure
+
+
+# ---------------------------
+# Hashing
+# ---------------------------
+
+def content_hash(value) -> str:
+    """Stable content hash for DataFrames, models and plain values."""
+    if isinstance(value, pd.DataFrame):
+        row_hashes = pd.util.hash_pandas_object(value, index=False).to_numpy()
+        return joblib.hash((list(value.columns), list(map(str, value.dtypes)), row_hashes))
+    return joblib.hash(value)
+
+
+def stage_key(stage: Stage, hashes: dict) -> str:
+    parts = [(name, hashes[name]) for name in stage.inputs]
+    return joblib.hash((stage.name, parts, sorted(stage.params.items())))
+
+
+def load_state(path=STATE_PATH) -> dict:
+    try:
+        return json.loads(Path(path).read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_state(state: dict, path=STATE_PATH) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(state, indent=2, sort_keys=True))
+
+
+# ---------------------------
+# Memory
+# ---------------------------
+
+def current_rss_mb() -> float:
+    """Resident set size of this process (Linux /proc; falls back to peak)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+
+def _run_stage(stage: Stage, inputs: dict, key: str, previous_key, force: bool):
+    start = time.perf_counter()
+
+    status = "ran"
+    outputs = None
+    if not force and not stage.always_run and stage.load and previous_key == key:
+        try:
+            outputs = stage.load()
+            status = "skipped"
+        except Exception as e:
+            print(f"[{stage.name}] cached outputs unavailable ({e}), re-running")
+
+    if outputs is None:
+        try:
+            outputs = stage.func(**inputs) or {}
+        except Exception as e:
+            if not stage.allow_failure:
+                raise
+            print(f"[WARN] Stage {stage.name} failed: {e}. Continuing.")
+            outputs = {name: None for name in stage.outputs}
+            status = "failed"
+            key = None
+
+    missing = set(stage.outputs) - set(outputs)
+    if missing:
+        raise RuntimeError(f"Stage {stage.name} did not produce {sorted(missing)}")
+
+    report = {
+        "stage": stage.name,
+        "status": status,
+        "seconds": time.perf_counter() - start,
+    }
+    return outputs, key, report
+
+
+def run_dag(stages, workers=2, force=False, state_path=STATE_PATH) -> dict:
+    """
+    Run stages in dependency order, `workers` at a time.
+    Returns every artifact produced.
+    """
+    produced_by = {}
+    for stage in stages:
+        for out in stage.outputs:
+            if out in produced_by:
+                raise ValueError(f"Artifact {out} produced by both {produced_by[out]} and {stage.name}")
+            produced_by[out] = stage.name
+    for stage in stages:
+        unknown = [i for i in stage.inputs if i not in produced_by]
+        if unknown:
+            raise ValueError(f"Stage {stage.name} needs unknown inputs {unknown}")
+
+    state = load_state(state_path)
+    artifacts = {}
+    hashes = {}
+    waiting = list(stages)
+    reports = []
+    run_start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        running = {}
+        while waiting or running:
+            ready = [s for s in waiting if all(i in artifacts for i in s.inputs)]
+            for stage in ready:
+                waiting.remove(stage)
+                print(f"\n>>> Stage: {stage.name}")
+                inputs = {name: artifacts[name] for name in stage.inputs}
+                key = stage_key(stage, hashes)
+                future = pool.submit(_run_stage, stage, inputs, key, state.get(stage.name), force)
+                running[future] = stage
+
+            if not running:
+                raise RuntimeError(f"Unsatisfiable stages: {[s.name for s in waiting]}")
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                outputs, key, report = future.result()
+                artifacts.update(outputs)
+                reports.append(report)
+
+                for name, value in outputs.items():
+                    if stage.always_run or key is None:
+                        hashes[name] = content_hash(value)
+                    else:
+                        hashes[name] = joblib.hash((key, name))
+
+                if key is None:
+                    state.pop(stage.name, None)
+                else:
+                    state[stage.name] = key
+
+    save_state(state, state_path)
+    print_report(reports, time.perf_counter() - run_start)
+    return artifacts
+
+
+def print_report(reports, total_seconds) -> None:
+    print("\nPipeline report")
+    print(f"{'stage':<20} {'status':<8} {'seconds':>9}")
+    for r in reports:
+        print(f"{r['stage']:<20} {r['status']:<8} {r['seconds']:>9.2f}")
+    print(f"{'total':<20} {'':<8} {total_seconds:>9.2f}   peak RSS {peak_rss_mb():.0f} MB")
@@ -6,29 +6,164 @@ projection_engine.py
 Loads trained models and latest player features,
 generates projections for a given date (default: today),
 and saves them under projections/YYYY-MM-DD/projections.csv.
+
+Player state is read from the player_state table that the feature
+builder maintains (one row per player), not from the full feature
+history. Models come from the model registry (flat, memory-mapped forests)
+when a version has been registered, falling back to the training .pkl files.
+
+Only players on teams scheduled for the target date are projected, with
+that game's opponent, home/away flag (see schedule.py) and the opponent's
+current defense-vs-position rate (dvp.py). If no games are found for the
+date, nothing is projected (the output has headers only).
 """
 
 from pathlib import Path
 from datetime import datetime
 import os
 
+import numpy as np
 import pandas as pd
 import joblib
 
-BASE_DIR = Path(__file__).resolve().parents[1]
-PROCESSED_DIR = BASE_DIR / "data" / "processed"
-MODELS_DIR = BASE_DIR / "models"
-PROJECTIONS_DIR = BASE_DIR / "projections"
-
-
-def load_latest_features() -> pd.DataFrame:
-    path = PROCESSED_DIR / "player_features_real.csv"
-    df = pd.read_csv(path, parse_dates=["game_date"])
+import dvp
+import frame_dtypes
+import model_registry
+import schedule
+from dataset_store import load_dataset
+from db import get_connection
 
+BASE_DIR = Path(__file__).resolve().parents[1]
+MODELS_DIR = Path(os.getenv("NBA_MODELS_DIR", BASE_DIR / "models"))
+PROJECTIONS_DIR = Path(os.getenv("NBA_PROJECTIONS_DIR", BASE_DIR / "projections"))
+
+FEATURE_COLS = [
+    "minutes_last_5",
+    "minutes_last_10",
+    "minutes_last_20",
+    "fppg_last_5",
+    "fppg_last_10",
+    "fppg_last_20",
+    "points_last_10",
+    "rebounds_last_10",
+    "assists_last_10",
+    "usage_proxy",
+    "dvp_last_20",
+]
+
+ID_COLS = ["player_id", "team_id", "opponent_team_id", "game_date"]
+
+PLAYER_STATE_TABLE = "player_state"
+
+# Players whose last game is older than this (relative to the newest game
+# on record) are treated as inactive and not projected.
+ACTIVE_DAYS = 60
+
+
+MODEL_NAMES = {
+    "minutes": "minutes_model",
+    "points": "points_model",
+    "rebounds": "rebounds_model",
+    "assists": "assists_model",
+    "fantasy_points": "fantasy_model",
+}
+
+KEEP_COLS = [
+    "player_id",
+    "team_id",
+    "game_id",
+    "opponent_team_id",
+    "is_home",
+    "proj_minutes",
+    "proj_points",
+    "proj_rebounds",
+    "proj_assists",
+    "proj_fantasy_points",
+]
+
+
+def latest_state(df: pd.DataFrame) -> pd.DataFrame:
     # For each player, keep the most recent game row as "current state"
     df = df.sort_values(["player_id", "game_date"])
-    latest = df.groupby("player_id").tail(1).copy()
-    return latest
+    return df.groupby("player_id").tail(1).copy()
+
+
+def load_latest_features(active_days: int = ACTIVE_DAYS) -> pd.DataFrame:
+    """Latest feature row of every recently active player."""
+    cols = ", ".join(ID_COLS + FEATURE_COLS)
+    query = f"""
+        SELECT {cols} FROM {PLAYER_STATE_TABLE}
+        WHERE game_date >= (
+            SELECT DATE(MAX(game_date), '-' || :days || ' days') FROM {PLAYER_STATE_TABLE}
+        )
+    """
+    try:
+        with get_connection() as conn:
+            df = pd.read_sql(query, conn, params={"days": active_days}, parse_dates=["game_date"])
+            return frame_dtypes.compact(df)
+    except pd.errors.DatabaseError:
+        # No snapshot yet (features built before player_state existed)
+        print(f"No {PLAYER_STATE_TABLE} table; reading the full features dataset")
+        return latest_state(load_dataset("features", columns=ID_COLS + FEATURE_COLS))
+
+
+def apply_slate(df: pd.DataFrame, target_date: str) -> pd.DataFrame:
+    """
+    Keep players whose team plays on target_date; attach that game's context.
+    No games on target_date gives an empty frame, not every player.
+    """
+    slate = schedule.team_slate(target_date)
+    if slate.empty:
+        print(f"WARNING: no games found for {target_date}; nothing to project")
+        return df.iloc[:0].assign(game_id=None, is_home=pd.NA)
+
+    df = df.drop(columns=["opponent_team_id"]).merge(
+        slate[["game_id", "team_id", "opponent_team_id", "is_home"]], on="team_id", how="inner"
+    )
+
+    # The stored dvp_last_20 was against the player's last opponent
+    with get_connection() as conn:
+        current = dvp.current_dvp(conn, df["player_id"], df["opponent_team_id"])
+    df["dvp_last_20"] = np.where(np.isnan(current), df["dvp_last_20"], current)
+    print(f"Slate for {target_date}: {len(slate) // 2} games, {len(df)} players")
+    return df
+
+
+def load_model(name: str):
+    """Latest registered version of a model, else its training pickle."""
+    if model_registry.latest_version(name) is not None:
+        return model_registry.load_model(name)
+    return joblib.load(MODELS_DIR / f"{name}.pkl")
+
+
+def load_models() -> dict:
+    """{target: model} for every projected stat."""
+    return {target: load_model(name) for target, name in MODEL_NAMES.items()}
+
+
+def project(df: pd.DataFrame, models: dict) -> pd.DataFrame:
+    """Add proj_<target> columns for every model to a latest-state frame."""
+    complete = df[FEATURE_COLS].notna().all(axis=1)
+    if not complete.all():
+        print(f"Skipping {(~complete).sum()} players without full feature history")
+    df = df[complete].copy()
+
+    for target, model in models.items():
+        # The minutes model is fit on a subset of the features
+        cols = list(getattr(model, "feature_names_in_", FEATURE_COLS))
+        df[f"proj_{target}"] = model.predict(df[cols]) if len(df) else np.nan
+
+    return df
+
+
+def save_projections(df: pd.DataFrame, target_date: str) -> Path:
+    out_dir = PROJECTIONS_DIR / target_date
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / "projections.csv"
+
+    df[KEEP_COLS].to_csv(out_path, index=False)
+    print(f"Saved projections to {out_path}")
+    return out_path
 
 
 def main(target_date: str | None = None):
@@ -37,55 +172,9 @@ def main(target_date: str | None = None):
 
     print(f"Generating projections for {target_date}...")
 
-    df = load_latest_features()
-
-    # Load models
-    minutes_model = joblib.load(MODELS_DIR / "minutes_model.pkl")
-    points_model = joblib.load(MODELS_DIR / "points_model.pkl")
-    rebounds_model = joblib.load(MODELS_DIR / "rebounds_model.pkl")
-    assists_model = joblib.load(MODELS_DIR / "assists_model.pkl")
-    fantasy_model = joblib.load(MODELS_DIR / "fantasy_model.pkl")
-
-    feature_cols = [
-        "minutes_last_5",
-        "minutes_last_10",
-        "minutes_last_20",
-        "fppg_last_5",
-        "fppg_last_10",
-        "fppg_last_20",
-        "points_last_10",
-        "rebounds_last_10",
-        "assists_last_10",
-        "usage_proxy",
-        "dvp_last_20",
-    ]
-
-    X = df[feature_cols]
-
-    df["proj_minutes"] = minutes_model.predict(X)
-    df["proj_points"] = points_model.predict(X)
-    df["proj_rebounds"] = rebounds_model.predict(X)
-    df["proj_assists"] = assists_model.predict(X)
-    df["proj_fantasy_points"] = fantasy_model.predict(X)
-
-    # Save projections
-    out_dir = PROJECTIONS_DIR / target_date
-    out_dir.mkdir(parents=True, exist_ok=True)
-    out_path = out_dir / "projections.csv"
-
-    keep_cols = [
-        "player_id",
-        "team_id",
-        "opponent_team_id",
-        "proj_minutes",
-        "proj_points",
-        "proj_rebounds",
-        "proj_assists",
-        "proj_fantasy_points",
-    ]
-
-    df[keep_cols].to_csv(out_path, index=False)
-    print(f"Saved projections to {out_path}")
+    df = apply_slate(load_latest_features(), target_date)
+    df = project(df, load_models())
+    save_projections(df, target_date)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+# src/projection_server.py
+
+"""
+projection_server.py
+
+Resident projection service. Keeps the models and each player's latest
+feature state in memory and serves projections over local HTTP:
+
+    GET /projections?date=YYYY-MM-DD&team=<team_id>&player=<player_id>
+    GET /stats      request latency percentiles + loaded model versions
+    GET /health
+
+Each date is projected against that day's slate (projection_engine.apply_slate:
+real opponent, home/away flag and current DvP) on first request, and the
+result is cached per date until the next reload.
+
+A background thread polls the model registry (LATEST pointers) and the
+features dataset; when either changes, a new snapshot is built off to the
+side and swapped in, so requests never see a half-loaded state.
+
+Usage:
+    python src/projection_server.py --port 8765
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+import model_registry
+import projection_engine as pe
+from dataset_store import find_dataset
+
+HOST = os.getenv("NBA_SERVER_HOST", "127.0.0.1")
+PORT = int(os.getenv("NBA_SERVER_PORT", "8765"))
+RELOAD_INTERVAL = float(os.getenv("NBA_SERVER_RELOAD_SECONDS", "30"))
+LATENCY_WINDOW = 10_000      # most recent requests kept for percentiles
+
+# ---------------------------
+# Service state
+# ---------------------------
+
+def source_versions() -> dict:
+    """What the current snapshot was built from; any change triggers a reload."""
+    versions = {}
+    for name in pe.MODEL_NAMES.values():
+        version = model_registry.latest_version(name)
+        if version is None:
+            pkl = pe.MODELS_DIR / f"{name}.pkl"
+            version = f"pkl@{pkl.stat().st_mtime_ns}" if pkl.exists() else None
+        versions[name] = version
+
+    features = find_dataset("features")
+    versions["features"] = f"{features.name}@{features.stat().st_mtime_ns}" if features else None
+    return versions
+
+
+class ProjectionService:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.versions = None
+        self.features = None
+        self.models = None
+        self.projections = {}   # date -> projected slate for the current snapshot
+        self.loaded_at = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def reload(self, force: bool = False) -> bool:
+        """Rebuild the snapshot if its sources changed. Returns True if reloaded."""
+        versions = source_versions()
+        if not force and versions == self.versions:
+            return False
+
+        start = time.perf_counter()
+        features = pe.load_latest_features()
+        models = pe.load_models()
+
+        with self._lock:
+            self.versions = versions
+            self.features = features
+            self.models = models
+            self.projections = {}
+            self.loaded_at = datetime.now().isoformat(timespec="seconds")
+
+        print(f"Loaded snapshot ({len(features)} players) in "
+              f"{time.perf_counter() - start:.2f}s: {versions}", flush=True)
+        return True
+
+    def projections_for(self, date: str):
+        """Projections for date's slate, built on first request and cached."""
+        with self._lock:
+            features, models, cache = self.features, self.models, self.projections
+
+        if features is None:
+            return None
+        if date not in cache:
+            # Stored into the snapshot's own cache, so a reload meanwhile drops it
+            df = pe.project(pe.apply_slate(features, date), models)
+            cache[date] = df[pe.KEEP_COLS].reset_index(drop=True)
+        return cache[date]
+
+    def query(self, date: str, team=None, player=None) -> list:
+        df = self.projections_for(date)
+        if df is None:
+            return []
+
+        mask = np.ones(len(df), dtype=bool)
+        if team is not None:
+            mask &= df["team_id"].to_numpy() == team
+        if player is not None:
+            mask &= df["player_id"].to_numpy() == player
+        return df[mask].to_dict(orient="records")
+
+    def record_latency(self, seconds: float) -> None:
+        self.latencies.append(seconds)
+
+    def stats(self) -> dict:
+        lat = np.array(self.latencies) * 1000
+        out = {
+            "requests": len(lat),
+            "loaded_at": self.loaded_at,
+            "versions": self.versions,
+        }
+        if len(lat):
+            p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+            out["latency_ms"] = {"p50": p50, "p90": p90, "p99": p99, "max": lat.max()}
+        return out
+
+    def watch(self, interval: float = RELOAD_INTERVAL) -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                self.reload()
+            except Exception as e:
+                # Keep serving the previous snapshot
+                print(f"Reload failed: {e}", flush=True)
+
+
+# ---------------------------
+# HTTP
+# ---------------------------
+
+def _int_param(params: dict, key: str):
+    values = params.get(key)
+    return int(values[0]) if values else None
+
+
+def make_handler(service: ProjectionService):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            start = time.perf_counter()
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+
+            try:
+                if url.path == "/projections":
+                    date = params.get("date", [datetime.today().strftime("%Y-%m-%d")])[0]
+                    datetime.strptime(date, "%Y-%m-%d")  # ValueError -> 400
+                    rows = service.query(date, _int_param(params, "team"), _int_param(params, "player"))
+                    self._send(200, {"date": date, "count": len(rows), "projections": rows})
+                elif url.path == "/stats":
+                    self._send(200, service.stats())
+                elif url.path == "/health":
+                    self._send(200, {"ok": service.features is not None})
+                else:
+                    self._send(404, {"error": f"unknown path {url.path}"})
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+            except Exception as e:
+                # A bad snapshot or query must not drop the connection unanswered
+                print(f"Error serving {self.path}: {e!r}", flush=True)
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+            finally:
+                if url.path == "/projections":
+                    service.record_latency(time.perf_counter() - start)
+
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload, default=float).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # latency is tracked in /stats instead of per-request logs
+
+    return Handler
+
+
+def serve(host: str = HOST, port: int = PORT, reload_interval: float = RELOAD_INTERVAL):
+    service = ProjectionService()
+    service.reload(force=True)
+
+    threading.Thread(target=service.watch, args=(reload_interval,), daemon=True).start()
+
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Serving projections on http://{host}:{port}/projections", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve projections over local HTTP.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL,
+                        help="Seconds between registry/feature change checks")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.reload_interval)
@@ -0,0 +1,273 @@
+# src/retrain.py
+
+"""
+retrain.py
+
+Incremental daily retraining instead of refitting every model from scratch.
+
+- Minutes model (LinearRegression): keeps the normal-equation sums
+  X'X and X'y on disk, started from the rows model_minutes.train fits.
+  Rows the training cutoff has moved past are added to the sums and the
+  coefficients re-solved, which gives exactly the least-squares fit on
+  that history for the cost of those rows only.
+- Stats forests: warm-started. Each update retires the oldest
+  TREES_PER_UPDATE trees and grows the same number on the last
+  RECENT_DAYS of the training slice, so the forest tracks recent form at
+  constant cost.
+
+Both follow the time split of the full trainers: as the data grows the
+cutoff moves forward and only rows up to it are learned from, so the
+newest rows (the test slice) stay out-of-sample for simulation's
+residuals and for the drift check.
+
+A full retrain (model_minutes.train + model_stats.train_all) happens when
+there are no models/state yet, every FULL_RETRAIN_DAYS, or when drift is
+detected: the current models' MAE on the new games is more than
+DRIFT_TOLERANCE above the running baseline MAE.
+"""
+
+import json
+from datetime import datetime
+import os
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+import model_minutes
+import model_registry
+import model_stats
+from build_model_dataset import time_split_cutoff
+from dataset_store import load_dataset
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+MODELS_DIR = Path(os.getenv("NBA_MODELS_DIR", BASE_DIR / "models"))
+
+STATE_PATH = MODELS_DIR / "retrain_state.json"
+MINUTES_SUMS_PATH = MODELS_DIR / "minutes_normal_eq.npz"
+
+FULL_RETRAIN_DAYS = 7
+DRIFT_TOLERANCE = 0.25
+BASELINE_SMOOTHING = 0.2     # EWMA weight of the newest MAE in the baseline
+TREES_PER_UPDATE = 20
+RECENT_DAYS = 60
+
+
+# ---------------------------
+# State
+# ---------------------------
+
+def load_state() -> dict:
+    try:
+        return json.loads(STATE_PATH.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_state(state: dict) -> None:
+    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    STATE_PATH.write_text(json.dumps(state, indent=2, sort_keys=True))
+
+
+def load_models():
+    minutes = joblib.load(MODELS_DIR / "minutes_model.pkl")
+    stats = {name: joblib.load(MODELS_DIR / f"{name}.pkl") for _, name in model_stats.TARGETS}
+    return minutes, stats
+
+
+# ---------------------------
+# Minutes: exact incremental least squares
+# ---------------------------
+
+def normal_equation_sums(df: pd.DataFrame):
+    """X'X and X'y with an intercept column, over complete rows of df."""
+    df = df.dropna(subset=model_minutes.FEATURE_COLS + ["minutes"])
+    X = df[model_minutes.FEATURE_COLS].to_numpy(dtype=np.float64)
+    X = np.hstack([X, np.ones((len(X), 1))])
+    y = df["minutes"].to_numpy(dtype=np.float64)
+    return X.T @ X, X.T @ y
+
+
+def solve_minutes_model(xtx, xty) -> LinearRegression:
+    beta = np.linalg.lstsq(xtx, xty, rcond=None)[0]
+
+    model = LinearRegression()
+    model.coef_ = beta[:-1]
+    model.intercept_ = beta[-1]
+    model.n_features_in_ = len(model_minutes.FEATURE_COLS)
+    model.feature_names_in_ = np.array(model_minutes.FEATURE_COLS, dtype=object)
+    return model
+
+
+# ---------------------------
+# Stats: warm-started forests
+# ---------------------------
+
+def refresh_forest(model, X_recent, y_recent, seed: int):
+    """Retire the oldest TREES_PER_UPDATE trees and grow as many on recent rows."""
+    keep = model.estimators_[TREES_PER_UPDATE:]
+    model.estimators_ = keep
+    model.set_params(
+        warm_start=True,
+        n_estimators=len(keep) + TREES_PER_UPDATE,
+        random_state=seed,  # fresh bootstrap seeds for the new trees
+    )
+    model.fit(X_recent, y_recent)
+    model.set_params(warm_start=False)
+    model.feature_names_in_ = np.array(model_stats.FEATURE_COLS, dtype=object)
+    return model
+
+
+# ---------------------------
+# Policy
+# ---------------------------
+
+def new_data_mae(df: pd.DataFrame, minutes, stats) -> dict:
+    """MAE of the current models on rows they have not been trained on."""
+    maes = {}
+    cols = model_minutes.FEATURE_COLS + ["minutes"]
+    part = df.dropna(subset=cols)
+    if len(part):
+        maes["minutes"] = float(np.mean(np.abs(minutes.predict(part[model_minutes.FEATURE_COLS]) - part["minutes"])))
+
+    for target, name in model_stats.TARGETS:
+        part = df.dropna(subset=model_stats.FEATURE_COLS + [target])
+        if len(part):
+            pred = stats[name].predict(part[model_stats.FEATURE_COLS])
+            maes[target] = float(np.mean(np.abs(pred - part[target])))
+    return maes
+
+
+def full_retrain_reason(state: dict, today, maes: dict):
+    """Why a full retrain is needed, or None."""
+    if not state:
+        return "no previous training state"
+
+    if "train_through" not in state:
+        return "no training-slice cutoff in the saved state"
+
+    last_full = datetime.strptime(state["last_full_retrain"], "%Y-%m-%d").date()
+    if (today - last_full).days >= FULL_RETRAIN_DAYS:
+        return f"scheduled ({FULL_RETRAIN_DAYS}+ days since last full retrain)"
+
+    baseline = state.get("baseline_mae", {})
+    for target, mae in maes.items():
+        if target in baseline and mae > baseline[target] * (1 + DRIFT_TOLERANCE):
+            return f"drift on {target} (MAE {mae:.2f} vs baseline {baseline[target]:.2f})"
+    return None
+
+
+# ---------------------------
+# Entry point
+# ---------------------------
+
+def full_retrain(df: pd.DataFrame, today) -> tuple:
+    minutes = model_minutes.train(df)
+    stats = model_stats.train_all(df)
+
+    # Same rows as model_minutes.train, so the first re-solve matches it
+    complete = df.dropna(subset=model_minutes.FEATURE_COLS + ["minutes"])
+    cutoff = time_split_cutoff(complete["game_date"])
+    xtx, xty = normal_equation_sums(complete[complete["game_date"] <= cutoff])
+    np.savez(MINUTES_SUMS_PATH, xtx=xtx, xty=xty)
+
+    state = load_state()
+    state.update({
+        "last_full_retrain": today.strftime("%Y-%m-%d"),
+        "trained_through": df["game_date"].max().strftime("%Y-%m-%d"),
+        "train_through": cutoff.strftime("%Y-%m-%d"),
+    })
+    save_state(state)
+    return minutes, stats
+
+
+def retrain(df: pd.DataFrame, today=None, force_full: bool = False) -> tuple:
+    """
+    Bring the minutes and stats models up to date with df (the model
+    dataset, including game_date). Returns (minutes_model, {name: model}).
+    """
+    today = today or datetime.today().date()
+    state = load_state()
+
+    if force_full or not state or not MINUTES_SUMS_PATH.exists():
+        print("Full retrain (forced or no previous state)...")
+        return full_retrain(df, today)
+
+    minutes, stats = load_models()
+    trained_through = pd.Timestamp(state["trained_through"])
+    new = df[df["game_date"] > trained_through]
+
+    if new.empty:
+        print("No new games since last training; models unchanged.")
+        return minutes, stats
+
+    maes = new_data_mae(new, minutes, stats)
+    reason = full_retrain_reason(state, today, maes)
+    if reason:
+        print(f"Full retrain: {reason}")
+        return full_retrain(df, today)
+
+    print(f"Incremental update with {len(new)} new rows...")
+
+    # Minutes: fold the rows the training cutoff moved past into the
+    # running sums and re-solve
+    complete = df.dropna(subset=model_minutes.FEATURE_COLS + ["minutes"])
+    train_through = time_split_cutoff(complete["game_date"])
+    passed = complete["game_date"].between(pd.Timestamp(state["train_through"]), train_through, inclusive="right")
+    sums = np.load(MINUTES_SUMS_PATH)
+    xtx_new, xty_new = normal_equation_sums(complete[passed])
+    xtx, xty = sums["xtx"] + xtx_new, sums["xty"] + xty_new
+    np.savez(MINUTES_SUMS_PATH, xtx=xtx, xty=xty)
+    minutes = solve_minutes_model(xtx, xty)
+    joblib.dump(minutes, MODELS_DIR / "minutes_model.pkl")
+    trained_through = new["game_date"].max().strftime("%Y-%m-%d")
+    model_registry.save_model(
+        "minutes_model", minutes, model_minutes.FEATURE_COLS, trained_through,
+        metrics={"mae_new": maes.get("minutes")},
+    )
+
+    # Stats: swap old trees for trees grown on the recent end of the
+    # training slice, with the same split as model_stats.train_all
+    complete = df.dropna(subset=model_stats.FEATURE_COLS + [t for t, _ in model_stats.TARGETS])
+    cutoff = time_split_cutoff(complete["game_date"])
+    window = complete["game_date"].between(cutoff - pd.Timedelta(days=RECENT_DAYS), cutoff, inclusive="right")
+    recent = complete[window]
+    X_recent = np.ascontiguousarray(recent[model_stats.FEATURE_COLS].to_numpy(dtype=np.float32))
+    seed = int(new["game_date"].max().strftime("%Y%m%d"))
+    for target, name in model_stats.TARGETS:
+        stats[name] = refresh_forest(stats[name], X_recent, recent[target].to_numpy(), seed)
+        joblib.dump(stats[name], MODELS_DIR / f"{name}.pkl")
+        model_registry.save_model(
+            name, stats[name], model_stats.FEATURE_COLS, trained_through,
+            metrics={"mae_new": maes.get(target)},
+        )
+
+    # Running baseline of out-of-sample error for drift detection
+    baseline = state.get("baseline_mae", {})
+    for target, mae in maes.items():
+        prev = baseline.get(target, mae)
+        baseline[target] = (1 - BASELINE_SMOOTHING) * prev + BASELINE_SMOOTHING * mae
+
+    state.update({
+        "baseline_mae": baseline,
+        "trained_through": trained_through,
+        "train_through": train_through.strftime("%Y-%m-%d"),
+    })
+    save_state(state)
+
+    print("MAE on new games: " + ", ".join(f"{t}={m:.2f}" for t, m in maes.items()))
+    return minutes, stats
+
+
+def main(force_full: bool = False):
+    cols = ["game_date", "minutes"] + model_stats.FEATURE_COLS + [t for t, _ in model_stats.TARGETS]
+    df = load_dataset("model_dataset", columns=list(dict.fromkeys(cols)))
+    retrain(df, force_full=force_full)
+
+
+if __name__ == "__main__":
+    import sys
+
+    main(force_full="--full" in sys.argv[1:])
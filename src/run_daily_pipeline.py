@@ -8,50 +8,225 @@ End-to-end pipeline runner for GitHub Actions:
 1) Ingest yesterday's boxscores
 2) Build real features
 3) Build modeling dataset
-4) Train minutes model
+4) Train minutes model        } run in parallel
 5) Train stats models (pts/reb/ast/fp)
+   (or, with --warm-start, one incremental retrain stage)
 6) Generate projections for today
+   (with --simulate, also Monte Carlo distributions; see simulation.py)
+
+All stages run in this one process through pipeline_dag, passing
+DataFrames and models in memory. Stages whose inputs are unchanged since
+the last run are skipped and their outputs reloaded from disk.
 """
 
 from datetime import datetime, timedelta
-import subprocess
-import sys
+import sqlite3
 from pathlib import Path
 
+import pandas as pd
+
+# Stage modules are imported here, on the main thread: sklearn is not safe
+# to import from two pool threads at once (minutes_model / stats_models).
+# Only ingest_boxscores stays lazy, since it pulls in nba_api.
+import build_features_real
+import build_model_dataset
+import model_minutes
+import model_stats
+import projection_engine as pe
+import retrain
+import simulation
+from dataset_store import load_dataset
+from db import get_connection
+from migrations import migrate
+from pipeline_dag import Stage, run_dag
+
 BASE_DIR = Path(__file__).resolve().parents[1]
 
 
-def run(cmd: list[str]):
-    print(f"\n>>> Running: {' '.join(cmd)}")
-    result = subprocess.run(cmd, cwd=BASE_DIR, capture_output=True, text=True)
-    print(result.stdout)
-    if result.returncode != 0:
-        print(result.stderr, file=sys.stderr)
-        raise SystemExit(result.returncode)
+# ---------------------------
+# Stage functions
+# ---------------------------
 
+def ingest(ingest_date: str):
+    import ingest_boxscores  # imports nba_api; only needed when ingesting
 
-def main():
-    today = datetime.today().date()
-    yesterday = today - timedelta(days=1)
+    ingest_boxscores.ingest_date(ingest_date)
+    return {"ingested": ingest_date}
+
+
+def db_fingerprint(ingested=None):
+    """
+    Change marker of the raw tables. Ingestion stamps games.updated_at on
+    every write (new games, live games finalized, stat corrections), so
+    the newest stamp plus the row and checkpoint counts change whenever
+    ingestion wrote anything.
+    """
+    with get_connection() as conn:
+        migrate(conn)
+        try:
+            games = tuple(conn.execute(
+                "SELECT COUNT(*), MAX(game_date), MAX(updated_at) FROM games;"
+            ).fetchone())
+            box = tuple(conn.execute("SELECT COUNT(*) FROM boxscores;").fetchone())
+            checkpoints = tuple(conn.execute(
+                "SELECT COUNT(*), MAX(completed_at) FROM ingest_checkpoints;"
+            ).fetchone())
+        except sqlite3.OperationalError:
+            games, box, checkpoints = (), (), ()
+    return {"db_fingerprint": {"games": games, "boxscores": box, "checkpoints": checkpoints}}
+
+
+def features(db_fingerprint):
+    build_features_real.build_features_incremental()
+    return {"features": load_dataset("features")}
+
+
+def model_dataset(features):
+    full, _, _ = build_model_dataset.build(features)
+    return {"model_dataset": full}
+
+
+def minutes_model(model_dataset):
+    return {"minutes_model": model_minutes.train(model_dataset)}
+
+
+def stats_models(model_dataset):
+    return {"stats_models": model_stats.train_all(model_dataset)}
+
+
+def warm_retrain(model_dataset):
+    minutes, stats = retrain.retrain(model_dataset)
+    return {"minutes_model": minutes, "stats_models": stats}
+
+
+def projections(features, minutes_model, stats_models, target_date, simulate=False):
+    models = {"minutes": minutes_model}
+    for target, name in pe.MODEL_NAMES.items():
+        if name in stats_models:
+            models[target] = stats_models[name]
+
+    # The features stage has already refreshed the player_state snapshot;
+    # `features` is an input only so this stage re-runs when it changes.
+    df = pe.project(pe.apply_slate(pe.load_latest_features(), target_date), models)
+    pe.save_projections(df, target_date)
 
-    # 1) Ingest yesterday's games
-    run(["python", "src/ingest_boxscores.py", yesterday.strftime("%Y-%m-%d")])
+    if simulate:
+        cov = simulation.load_residual_covariance(models)
+        simulation.save_distributions(simulation.simulate(df, models, cov), target_date)
+    return {"projections": df}
 
-    # 2) Build real features
-    run(["python", "src/build_features_real.py"])
 
-    # 3) Build modeling dataset
-    run(["python", "src/build_model_dataset.py"])
+# ---------------------------
+# Loaders for skipped stages
+# ---------------------------
 
-    # 4) Train minutes model
-    run(["python", "src/model_minutes.py"])
+def load_features():
+    return {"features": load_dataset("features")}
 
-    # 5) Train stats models
-    run(["python", "src/model_stats.py"])
 
-    # 6) Generate projections for today
-    run(["python", "src/projection_engine.py", today.strftime("%Y-%m-%d")])
+def load_model_dataset():
+    return {"model_dataset": load_dataset("model_dataset")}
+
+
+def load_minutes_model():
+    return {"minutes_model": pe.load_model("minutes_model")}
+
+
+def load_stats_models():
+    return {"stats_models": {name: pe.load_model(name) for _, name in model_stats.TARGETS}}
+
+
+def load_projections(target_date):
+    return {"projections": pd.read_csv(pe.PROJECTIONS_DIR / target_date / "projections.csv")}
+
+
+# ---------------------------
+# Graph
+# ---------------------------
+
+def build_stages(ingest_date: str | None, target_date: str, warm_start: bool = False,
+                 simulate: bool = False):
+    stages = []
+
+    if ingest_date:
+        # Ingestion can hang/fail on stats.nba.com; keep going with what's in the DB
+        stages.append(Stage(
+            "ingest", lambda: ingest(ingest_date), outputs=["ingested"],
+            always_run=True, allow_failure=True,
+        ))
+        fingerprint_inputs = ["ingested"]
+    else:
+        fingerprint_inputs = []
+
+    stages += [
+        Stage("db_fingerprint", db_fingerprint, inputs=fingerprint_inputs,
+              outputs=["db_fingerprint"], always_run=True),
+        Stage("features", features, inputs=["db_fingerprint"],
+              outputs=["features"], load=load_features),
+        Stage("model_dataset", model_dataset, inputs=["features"],
+              outputs=["model_dataset"], load=load_model_dataset),
+    ]
+
+    if warm_start:
+        # retrain.py decides between an incremental update and a full refit
+        stages.append(Stage(
+            "retrain", warm_retrain, inputs=["model_dataset"],
+            outputs=["minutes_model", "stats_models"],
+            load=lambda: {**load_minutes_model(), **load_stats_models()},
+        ))
+    else:
+        stages += [
+            Stage("minutes_model", minutes_model, inputs=["model_dataset"],
+                  outputs=["minutes_model"], load=load_minutes_model),
+            Stage("stats_models", stats_models, inputs=["model_dataset"],
+                  outputs=["stats_models"], load=load_stats_models),
+        ]
+
+    stages += [
+        Stage("projections",
+              lambda features, minutes_model, stats_models: projections(
+                  features, minutes_model, stats_models, target_date, simulate),
+              inputs=["features", "minutes_model", "stats_models"],
+              outputs=["projections"], params={"target_date": target_date, "simulate": simulate},
+              load=lambda: load_projections(target_date)),
+    ]
+    return stages
+
+
+def main(ingest_date: str | None = "yesterday", target_date: str | None = None,
+         force: bool = False, workers: int = 2, warm_start: bool = False,
+         simulate: bool = False):
+    today = datetime.today().date()
+    if ingest_date == "yesterday":
+        ingest_date = (today - timedelta(days=1)).strftime("%Y-%m-%d")
+    if target_date is None:
+        target_date = today.strftime("%Y-%m-%d")
+
+    stages = build_stages(ingest_date, target_date, warm_start=warm_start, simulate=simulate)
+    return run_dag(stages, workers=workers, force=force)
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the daily NBA pipeline in-process.")
+    parser.add_argument("--ingest-date", default="yesterday",
+                        help="Date to ingest (YYYY-MM-DD or 'yesterday')")
+    parser.add_argument("--skip-ingest", action="store_true", help="Use the DB as-is")
+    parser.add_argument("--date", help="Projection date (default: today)")
+    parser.add_argument("--force", action="store_true", help="Re-run every stage")
+    parser.add_argument("--workers", type=int, default=2, help="Stages to run in parallel")
+    parser.add_argument("--warm-start", action="store_true",
+                        help="Update models incrementally (see retrain.py) instead of refitting")
+    parser.add_argument("--simulate", action="store_true",
+                        help="Also write Monte Carlo distributions next to projections.csv")
+    args = parser.parse_args()
+
+    main(
+        ingest_date=None if args.skip_ingest else args.ingest_date,
+        target_date=args.date,
+        force=args.force,
+        workers=args.workers,
+        warm_start=args.warm_start,
+        simulate=args.simulate,
+    )
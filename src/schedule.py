@@ -0,0 +1,115 @@
+# src/schedule.py
+
+"""
+schedule.py
+
+Which teams play on a given date, for slate-aware projection.
+
+Reads the league schedule feed (the same scheduleLeagueV2 file
+.github/scripts/fetch_schedule.py polls) through api_cache, and falls back
+to the games table for dates the feed doesn't cover (past seasons,
+backfills, offline runs).
+"""
+
+from datetime import datetime
+from types import SimpleNamespace
+
+import pandas as pd
+import requests
+
+import api_cache
+from db import get_connection
+
+SCHEDULE_URL = "https://cdn.nba.com/static/json/staticData/scheduleLeagueV2.json"
+SCHEDULE_TTL = 60 * 60    # tip times and postponements change during the day
+
+SLATE_COLUMNS = ["game_id", "team_id", "opponent_team_id", "is_home", "tipoff_utc"]
+
+
+def parse_game_date(value: str) -> str:
+    """The feed uses 'MM/DD/YYYY 00:00:00'; accept ISO dates as well."""
+    value = value.strip()
+    for fmt in ("%m/%d/%Y %H:%M:%S", "%Y-%m-%d", "%Y-%m-%dT%H:%M:%SZ"):
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return value[:10]
+
+
+def fetch_schedule() -> pd.DataFrame:
+    """One row per game in the current season's schedule."""
+    r = requests.get(SCHEDULE_URL, timeout=10)
+    r.raise_for_status()
+    data = r.json()
+
+    rows = []
+    for day in data["leagueSchedule"]["gameDates"]:
+        game_date = parse_game_date(day["gameDate"])
+        for g in day["games"]:
+            rows.append({
+                "game_id": g["gameId"],
+                "game_date": game_date,
+                "tipoff_utc": g.get("gameTimeUTC"),
+                "game_status": g.get("gameStatus"),
+                "home_team_id": g["homeTeam"]["teamId"],
+                "away_team_id": g["awayTeam"]["teamId"],
+            })
+    return pd.DataFrame(rows)
+
+
+def load_schedule() -> pd.DataFrame:
+    frames = api_cache.cached_call(
+        "scheduleLeagueV2", {},
+        lambda: SimpleNamespace(get_data_frames=lambda: [fetch_schedule()]),
+        ttl=SCHEDULE_TTL,
+    ).get_data_frames()
+    return frames[0]
+
+
+def games_on(game_date: str) -> pd.DataFrame:
+    """Games on game_date from the schedule feed, else from the games table."""
+    try:
+        schedule = load_schedule()
+        games = schedule[schedule["game_date"] == game_date]
+        # Postponed games stay in the feed with status 1 but move dates, so
+        # date matching is enough here.
+        if len(games):
+            return games[["game_id", "home_team_id", "away_team_id", "tipoff_utc"]]
+    except (requests.RequestException, api_cache.OfflineCacheMiss, KeyError, ValueError) as e:
+        print(f"Schedule feed unavailable ({e}); using the games table")
+
+    with get_connection() as conn:
+        games = pd.read_sql(
+            "SELECT game_id, home_team_id, away_team_id FROM games WHERE DATE(game_date) = ?;",
+            conn, params=(game_date,),
+        )
+    games["tipoff_utc"] = None
+    return games
+
+
+def team_slate(game_date: str) -> pd.DataFrame:
+    """Two rows per game (one per team) with the opponent and home/away flag."""
+    games = games_on(game_date)
+
+    home = pd.DataFrame({
+        "game_id": games["game_id"],
+        "team_id": games["home_team_id"],
+        "opponent_team_id": games["away_team_id"],
+        "is_home": 1,
+        "tipoff_utc": games["tipoff_utc"],
+    })
+    away = home.assign(
+        team_id=games["away_team_id"], opponent_team_id=games["home_team_id"], is_home=0
+    )
+    slate = pd.concat([home, away], ignore_index=True)[SLATE_COLUMNS]
+    slate["team_id"] = slate["team_id"].astype("int64")
+    slate["opponent_team_id"] = slate["opponent_team_id"].astype("int64")
+    return slate
+
+
+if __name__ == "__main__":
+    import sys
+
+    date_arg = sys.argv[1] if len(sys.argv) > 1 else datetime.today().strftime("%Y-%m-%d")
+    print(team_slate(date_arg).to_string(index=False))
@@ -0,0 +1,177 @@
+# src/scoring.py
+
+"""
+scoring.py
+
+Fantasy scoring rules for every site, evaluated in one matrix product.
+
+Each rule set is a weight per stat column plus optional double-double /
+triple-double bonuses. All registered sites are scored together as
+
+    [stats | double_double | triple_double] @ W
+
+where W has one column per site. Ingestion stores the result as
+<site>_fp columns on boxscores (dk_fp, fd_fp, yahoo_fp, ...), so nothing
+downstream recomputes fantasy points.
+
+Custom rules:
+    scoring.register_rules("league", {"points": 1, "rebounds": 1, ...},
+                           double_double=2)
+"""
+
+import numpy as np
+import pandas as pd
+
+# Stats that rules may weight (boxscores column names)
+STAT_COLUMNS = [
+    "points",
+    "rebounds",
+    "assists",
+    "steals",
+    "blocks",
+    "turnovers",
+    "three_points_made",
+    "field_goals_made",
+    "field_goals_attempted",
+    "free_throws_made",
+    "free_throws_attempted",
+]
+
+# Categories that count towards double- and triple-doubles
+DOUBLE_CATEGORIES = ["points", "rebounds", "assists", "steals", "blocks"]
+
+# Bonuses are cumulative: a triple-double also earns the double-double bonus
+SCORING_RULES = {
+    "dk": {
+        "weights": {
+            "points": 1, "three_points_made": 0.5, "rebounds": 1.25, "assists": 1.5,
+            "steals": 2, "blocks": 2, "turnovers": -0.5,
+        },
+        "double_double": 1.5,
+        "triple_double": 3.0,
+    },
+    "fd": {
+        "weights": {
+            "points": 1, "rebounds": 1.2, "assists": 1.5,
+            "steals": 3, "blocks": 3, "turnovers": -1,
+        },
+    },
+    "yahoo": {
+        "weights": {
+            "points": 1, "three_points_made": 0.5, "rebounds": 1.2, "assists": 1.5,
+            "steals": 3, "blocks": 3, "turnovers": -1,
+        },
+    },
+}
+
+# Site used for the fantasy_points features/targets
+DEFAULT_SITE = "dk"
+
+
+def register_rules(site: str, weights: dict, double_double: float = 0.0,
+                   triple_double: float = 0.0) -> None:
+    unknown = set(weights) - set(STAT_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown stat columns in {site} rules: {sorted(unknown)}")
+    SCORING_RULES[site] = {
+        "weights": dict(weights),
+        "double_double": double_double,
+        "triple_double": triple_double,
+    }
+
+
+def score_column(site: str) -> str:
+    return f"{site}_fp"
+
+
+def score_columns(sites=None) -> list:
+    return [score_column(s) for s in (sites or SCORING_RULES)]
+
+
+def weight_matrix(sites) -> np.ndarray:
+    """(len(STAT_COLUMNS) + 2, n_sites); the last two rows are the DD/TD bonuses."""
+    W = np.zeros((len(STAT_COLUMNS) + 2, len(sites)))
+    for j, site in enumerate(sites):
+        rules = SCORING_RULES[site]
+        for stat, weight in rules["weights"].items():
+            W[STAT_COLUMNS.index(stat), j] = weight
+        W[-2, j] = rules.get("double_double", 0.0)
+        W[-1, j] = rules.get("triple_double", 0.0)
+    return W
+
+
+def fantasy_scores(df: pd.DataFrame, sites=None) -> pd.DataFrame:
+    """<site>_fp columns for every row of a boxscore-shaped frame."""
+    sites = list(sites or SCORING_RULES)
+
+    # Missing stat columns (older table layouts) and blanks count as 0
+    stats = df.reindex(columns=STAT_COLUMNS).to_numpy(dtype=np.float64, na_value=0.0)
+
+    doubles = (stats[:, [STAT_COLUMNS.index(c) for c in DOUBLE_CATEGORIES]] >= 10).sum(axis=1)
+    X = np.column_stack([stats, doubles >= 2, doubles >= 3])
+
+    return pd.DataFrame(X @ weight_matrix(sites), columns=score_columns(sites), index=df.index)
+
+
+def score_sql(site: str, columns, alias: str = "") -> str:
+    """
+    SQL expression scoring one site from the stat columns, for tables
+    that predate the stored <site>_fp column. Missing columns count as 0.
+    """
+    prefix = f"{alias}." if alias else ""
+
+    def stat(col):
+        return f"COALESCE({prefix}{col}, 0)" if col in columns else "0"
+
+    rules = SCORING_RULES[site]
+    terms = [f"{weight!r} * {stat(col)}" for col, weight in rules["weights"].items()]
+
+    doubles = " + ".join(f"({stat(c)} >= 10)" for c in DOUBLE_CATEGORIES)
+    for bonus, n in (("double_double", 2), ("triple_double", 3)):
+        if rules.get(bonus):
+            terms.append(f"{rules[bonus]!r} * (({doubles}) >= {n})")
+    return "(" + " + ".join(terms) + ")"
+
+
+# ---------------------------
+# Stored scores
+# ---------------------------
+
+def ensure_score_columns(conn, table: str = "boxscores") -> list:
+    """Add any missing <site>_fp columns; returns the ones added."""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table});")}
+    added = [c for c in score_columns() if c not in existing]
+    for col in added:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} REAL;")
+    return added
+
+
+def rescore(conn, table: str = "boxscores", chunk_rows: int = 200_000) -> int:
+    """Recompute every stored score column from the stat columns."""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table});")}
+    stats = [c for c in STAT_COLUMNS if c in existing]
+    cols = score_columns()
+
+    # Keyset pages, so no read cursor stays open across the UPDATEs
+    query = f"SELECT rowid, {', '.join(stats)} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?;"
+    update = f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in cols)} WHERE rowid = ?;"
+
+    updated, last = 0, -1
+    while True:
+        chunk = pd.read_sql(query, conn, params=(last, chunk_rows))
+        if chunk.empty:
+            return updated
+        scores = fantasy_scores(chunk)[cols].to_numpy().tolist()
+        conn.executemany(update, [(*s, int(r)) for s, r in zip(scores, chunk["rowid"])])
+        updated += len(chunk)
+        last = int(chunk["rowid"].iloc[-1])
+
+
+if __name__ == "__main__":
+    from db import get_connection
+
+    with get_connection() as conn:
+        added = ensure_score_columns(conn)
+        n = rescore(conn)
+        conn.commit()
+    print(f"Rescored {n} boxscore rows ({', '.join(score_columns())}); added {added or 'no'} columns")
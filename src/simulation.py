@@ -0,0 +1,180 @@
+# src/simulation.py
+
+"""
+simulation.py
+
+Monte Carlo distribution projections.
+
+For every player on the slate and every simulation:
+    - each forest target draws one of its trees' predictions (model
+      uncertainty); the linear minutes model contributes its point estimate
+    - a correlated residual vector (minutes, points, rebounds, assists,
+      fantasy points) is added, drawn from the residual covariance of the
+      models on the most recent rows of the time-split test dataset
+      (Cholesky factor, so e.g. extra minutes come with extra points)
+
+All players x simulations are drawn as NumPy arrays at once, in player
+chunks sized to fit MEMORY_BUDGET_MB. Summaries (mean, p10/p50/p90 per
+stat, boom/bust probabilities on fantasy points) are written to
+projections/YYYY-MM-DD/distributions.csv next to projections.csv.
+"""
+
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import projection_engine as pe
+from dataset_store import load_dataset
+
+N_SIMS = int(os.getenv("NBA_SIM_COUNT", "10000"))
+MEMORY_BUDGET_MB = float(os.getenv("NBA_SIM_MEMORY_MB", "256"))
+
+SIM_TARGETS = ["minutes", "points", "rebounds", "assists", "fantasy_points"]
+PERCENTILES = [10, 50, 90]
+
+RESIDUAL_ROWS = 20_000       # newest held-out rows used for the covariance
+MAX_MINUTES = 48.0
+
+# Boom / bust relative to the point projection of fantasy points
+BOOM_MULTIPLIER = 1.25
+BUST_MULTIPLIER = 0.75
+
+
+# ---------------------------
+# Model pieces
+# ---------------------------
+
+def tree_predictions(model, X: pd.DataFrame) -> np.ndarray:
+    """(n_trees, n_rows) predictions; a single row for non-ensemble models."""
+    if hasattr(model, "predict_per_tree"):
+        return model.predict_per_tree(X)
+    if hasattr(model, "estimators_"):
+        values = X.to_numpy(dtype=np.float32)
+        return np.stack([est.predict(values) for est in model.estimators_])
+    return np.asarray(model.predict(X))[None, :]
+
+
+def _features(model, df: pd.DataFrame) -> pd.DataFrame:
+    return df[list(getattr(model, "feature_names_in_", pe.FEATURE_COLS))]
+
+
+def residual_covariance(df: pd.DataFrame, models: dict) -> np.ndarray:
+    """Covariance of (actual - predicted) across SIM_TARGETS."""
+    df = df.dropna(subset=pe.FEATURE_COLS + SIM_TARGETS)
+    residuals = np.column_stack([
+        df[target].to_numpy() - models[target].predict(_features(models[target], df))
+        for target in SIM_TARGETS
+    ])
+    return np.cov(residuals, rowvar=False)
+
+
+def load_residual_covariance(models: dict) -> np.ndarray:
+    df = load_dataset("test", columns=["game_date"] + pe.FEATURE_COLS + SIM_TARGETS)
+    df = df.sort_values("game_date").tail(RESIDUAL_ROWS)
+    return residual_covariance(df, models)
+
+
+# ---------------------------
+# Simulation
+# ---------------------------
+
+def chunk_size(n_sims: int, memory_mb: float = MEMORY_BUDGET_MB) -> int:
+    """Players per chunk so the chunk's working arrays fit the budget."""
+    # normal draws, samples, tree picks and the percentile sort copy,
+    # all 8-byte values per simulation per target
+    bytes_per_player = n_sims * len(SIM_TARGETS) * 8 * 4
+    return max(1, int(memory_mb * 1024 * 1024 // bytes_per_player))
+
+
+def simulate_chunk(trees: list, chol: np.ndarray, n_sims: int, rng) -> np.ndarray:
+    """Samples of shape (n_players, n_sims, n_targets) for one chunk."""
+    n_players = trees[0].shape[1]
+    cols = np.arange(n_players)[:, None]
+
+    samples = rng.standard_normal((n_players, n_sims, len(SIM_TARGETS))) @ chol.T
+    for k, preds in enumerate(trees):
+        if len(preds) == 1:
+            samples[:, :, k] += preds[0][:, None]
+        else:
+            picks = rng.integers(len(preds), size=(n_players, n_sims))
+            samples[:, :, k] += preds[picks, cols]
+
+    np.clip(samples, 0, None, out=samples)
+    np.minimum(samples[:, :, 0], MAX_MINUTES, out=samples[:, :, 0])
+    return samples
+
+
+def summarize(samples: np.ndarray, point_fp: np.ndarray) -> dict:
+    out = {}
+    pct = np.percentile(samples, PERCENTILES, axis=1)     # (n_pct, players, targets)
+    mean = samples.mean(axis=1)
+    for k, target in enumerate(SIM_TARGETS):
+        out[f"sim_{target}_mean"] = mean[:, k]
+        for i, p in enumerate(PERCENTILES):
+            out[f"sim_{target}_p{p}"] = pct[i, :, k]
+
+    fp = samples[:, :, SIM_TARGETS.index("fantasy_points")]
+    out["boom_prob"] = (fp >= BOOM_MULTIPLIER * point_fp[:, None]).mean(axis=1)
+    out["bust_prob"] = (fp <= BUST_MULTIPLIER * point_fp[:, None]).mean(axis=1)
+    return out
+
+
+def simulate(df: pd.DataFrame, models: dict, cov: np.ndarray, n_sims: int = N_SIMS,
+             seed: int = 0, memory_mb: float = MEMORY_BUDGET_MB) -> pd.DataFrame:
+    """
+    Distribution summaries for a projected frame (output of
+    projection_engine.project, so proj_fantasy_points is present).
+    """
+    # Small jitter keeps the factorisation valid if a target has ~0 variance
+    chol = np.linalg.cholesky(cov + np.eye(len(cov)) * 1e-9)
+    rng = np.random.default_rng(seed)
+    step = chunk_size(n_sims, memory_mb)
+
+    parts = []
+    for start in range(0, len(df), step):
+        chunk = df.iloc[start:start + step]
+        trees = [tree_predictions(models[t], _features(models[t], chunk)) for t in SIM_TARGETS]
+        samples = simulate_chunk(trees, chol, n_sims, rng)
+        parts.append(pd.DataFrame(
+            summarize(samples, chunk["proj_fantasy_points"].to_numpy()), index=chunk.index
+        ))
+
+    id_cols = [c for c in ["player_id", "team_id", "game_id"] if c in df.columns]
+    if not parts:
+        return df[id_cols].copy()
+    return pd.concat([df[id_cols], pd.concat(parts)], axis=1)
+
+
+def save_distributions(summary: pd.DataFrame, target_date: str):
+    out_dir = pe.PROJECTIONS_DIR / target_date
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / "distributions.csv"
+
+    summary.to_csv(out_path, index=False)
+    print(f"Saved distributions to {out_path}")
+    return out_path
+
+
+def main(target_date: str | None = None, n_sims: int = N_SIMS):
+    if target_date is None:
+        target_date = datetime.today().strftime("%Y-%m-%d")
+
+    print(f"Simulating {n_sims} outcomes per player for {target_date}...")
+
+    models = pe.load_models()
+    df = pe.project(pe.apply_slate(pe.load_latest_features(), target_date), models)
+    summary = simulate(df, models, load_residual_covariance(models), n_sims=n_sims)
+    save_distributions(summary, target_date)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Monte Carlo projection distributions.")
+    parser.add_argument("date", nargs="?", help="Projection date (default: today)")
+    parser.add_argument("--sims", type=int, default=N_SIMS, help="Simulations per player")
+    args = parser.parse_args()
+
+    main(args.date, n_sims=args.sims)
@@ -0,0 +1,235 @@
+# src/synthetic.py
+
+"""
+synthetic.py
+
+Synthetic NBA seasons for benchmarking and offline development.
+
+Writes `games` and `boxscores` rows into a DB at the current schema
+(migrations.py), at any scale, without touching stats.nba.com:
+
+    - 30 teams (ids from data/static/team_locations.csv), 82 games each,
+      spread over ~165 game days from late October to mid April
+    - 13-man rosters with ~30% turnover between seasons
+    - per-player roles (starter / rotation / bench) and per-minute rates;
+      team minutes sum to 240, with occasional DNPs
+    - shooting splits (2s, 3s, free throws) consistent with points
+    - fantasy points for every site in scoring.py
+
+Usage:
+    python src/synthetic.py --seasons 5 --db data/synthetic_5.db
+"""
+
+import sqlite3
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import migrations
+import scoring
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+TEAM_LOCATIONS_PATH = BASE_DIR / "data" / "static" / "team_locations.csv"
+
+GAMES_PER_TEAM = 82
+ROSTER_SIZE = 13
+ROSTER_TURNOVER = 0.30
+SEASON_START = (10, 22)       # month, day
+SEASON_DAYS = 175
+DNP_RATE = 0.08
+
+# Share of team minutes by roster slot (starters first)
+ROLE_MINUTES = np.array([34, 33, 32, 30, 29, 24, 22, 18, 15, 8, 5, 0, 0], dtype=float)
+
+# Per-minute means for an average player; each player gets a multiplier
+RATES = {
+    "field_goals_attempted": 0.36,
+    "free_throws_attempted": 0.09,
+    "rebounds": 0.18,
+    "assists": 0.10,
+    "steals": 0.03,
+    "blocks": 0.022,
+    "turnovers": 0.055,
+}
+THREE_SHARE = 0.39
+TWO_PCT, THREE_PCT, FT_PCT = 0.53, 0.36, 0.78
+
+# ---------------------------
+# Schedule
+# ---------------------------
+
+def team_ids() -> np.ndarray:
+    return pd.read_csv(TEAM_LOCATIONS_PATH)["team_id"].to_numpy()
+
+
+def season_schedule(teams: np.ndarray, season: int, rng) -> pd.DataFrame:
+    """~82 games per team over SEASON_DAYS; no team plays twice in a day."""
+    start = date(season, *SEASON_START)
+    remaining = np.full(len(teams), GAMES_PER_TEAM)
+    per_day = len(teams) * GAMES_PER_TEAM / 2 / (SEASON_DAYS * 0.95)
+
+    rows = []
+    for day in range(SEASON_DAYS):
+        if not remaining.any():
+            break
+        days_left = max(1, SEASON_DAYS - day)
+        n_games = min(rng.poisson(max(per_day, remaining.sum() / 2 / days_left)), len(teams) // 2)
+
+        # Teams with the most games left get priority
+        order = np.argsort(-(remaining + rng.random(len(teams))))
+        playing = [i for i in order if remaining[i] > 0][: 2 * n_games]
+        playing = rng.permutation(playing)
+        for home, away in zip(playing[0::2], playing[1::2]):
+            rows.append((start + timedelta(days=day), teams[home], teams[away]))
+            remaining[[home, away]] -= 1
+
+    games = pd.DataFrame(rows, columns=["game_date", "home_team_id", "away_team_id"])
+    games["game_date"] = pd.to_datetime(games["game_date"]).dt.strftime("%Y-%m-%d")
+    games.insert(0, "game_id", [f"002{season % 100:02d}{i + 1:05d}" for i in range(len(games))])
+    games.insert(1, "season", f"{season}-{(season + 1) % 100:02d}")
+    return games
+
+
+# ---------------------------
+# Players
+# ---------------------------
+
+def next_rosters(rosters: np.ndarray, next_id: int, rng):
+    """Replace ~ROSTER_TURNOVER of each roster with new player ids."""
+    replace = rng.random(rosters.shape) < ROSTER_TURNOVER
+    n_new = int(replace.sum())
+    rosters = rosters.copy()
+    rosters[replace] = np.arange(next_id, next_id + n_new)
+    return rosters, next_id + n_new
+
+
+def player_profiles(player_ids: np.ndarray, rng) -> pd.DataFrame:
+    """Stable per-player talent: role minutes and per-minute rate multipliers."""
+    n = len(player_ids)
+    return pd.DataFrame({
+        "player_id": player_ids,
+        "skill": rng.lognormal(0.0, 0.25, n),
+        "big": rng.random(n),       # rebounds/blocks vs assists tilt
+    }).set_index("player_id")
+
+
+# ---------------------------
+# Boxscores
+# ---------------------------
+
+def season_boxscores(games: pd.DataFrame, teams: np.ndarray, rosters: np.ndarray,
+                     profiles: pd.DataFrame, rng) -> pd.DataFrame:
+    team_index = {t: i for i, t in enumerate(teams)}
+    n_games = len(games)
+
+    # One row per (game, side, roster slot)
+    side_teams = np.stack([games["home_team_id"], games["away_team_id"]], axis=1)
+    team_id = np.repeat(side_teams.ravel(), ROSTER_SIZE)
+    game_id = np.repeat(games["game_id"].to_numpy(), 2 * ROSTER_SIZE)
+    game_date = np.repeat(games["game_date"].to_numpy(), 2 * ROSTER_SIZE)
+    opponent_id = np.repeat(side_teams[:, ::-1].ravel(), ROSTER_SIZE)
+    slot = np.tile(np.arange(ROSTER_SIZE), 2 * n_games)
+    player_id = rosters[np.vectorize(team_index.get)(team_id), slot]
+
+    prof = profiles.loc[player_id]
+    skill = prof["skill"].to_numpy()
+    big = prof["big"].to_numpy()
+
+    # Minutes: role share with game noise, DNPs, then rescaled to 240 per team
+    minutes = ROLE_MINUTES[slot] * rng.normal(1.0, 0.15, len(slot))
+    minutes[rng.random(len(slot)) < DNP_RATE] = 0
+    minutes = np.clip(minutes, 0, 48).reshape(-1, ROSTER_SIZE)
+    minutes *= 240 / minutes.sum(axis=1, keepdims=True)
+    minutes = np.round(np.clip(minutes, 0, 48).ravel(), 1)
+
+    def counts(rate, tilt=1.0):
+        return rng.poisson(rate * skill * tilt * minutes)
+
+    fga = counts(RATES["field_goals_attempted"])
+    three_pa = rng.binomial(fga, THREE_SHARE * (1.3 - 0.6 * big))
+    three_pm = rng.binomial(three_pa, THREE_PCT)
+    two_pm = rng.binomial(fga - three_pa, TWO_PCT)
+    fta = counts(RATES["free_throws_attempted"])
+    ftm = rng.binomial(fta, FT_PCT)
+
+    box = pd.DataFrame({
+        "game_id": game_id,
+        "player_id": player_id,
+        "team_id": team_id,
+        "opponent_team_id": opponent_id,
+        "game_date": game_date,
+        "minutes": minutes,
+        "points": 2 * two_pm + 3 * three_pm + ftm,
+        "rebounds": counts(RATES["rebounds"], 0.5 + big),
+        "assists": counts(RATES["assists"], 1.5 - big),
+        "steals": counts(RATES["steals"]),
+        "blocks": counts(RATES["blocks"], 0.3 + 1.4 * big),
+        "turnovers": counts(RATES["turnovers"]),
+        "field_goals_made": two_pm + three_pm,
+        "field_goals_attempted": fga,
+        "three_points_made": three_pm,
+        "three_points_attempted": three_pa,
+        "free_throws_made": ftm,
+        "free_throws_attempted": fta,
+    })
+    return box.join(scoring.fantasy_scores(box))
+
+
+# ---------------------------
+# Entry point
+# ---------------------------
+
+def generate(db_path, seasons: int = 1, first_season: int | None = None, seed: int = 0) -> dict:
+    """Write `seasons` synthetic seasons into a fresh SQLite DB at db_path."""
+    rng = np.random.default_rng(seed)
+    teams = team_ids()
+    first_season = first_season or date.today().year - seasons
+
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+
+    rosters = np.arange(len(teams) * ROSTER_SIZE).reshape(len(teams), ROSTER_SIZE) + 1
+    next_id = rosters.size + 1
+    profiles = player_profiles(rosters.ravel(), rng)
+
+    con = sqlite3.connect(db_path)
+    migrations.migrate(con, verbose=False)
+
+    n_games = n_rows = 0
+    for season in range(first_season, first_season + seasons):
+        if season > first_season:
+            rosters, start_id = next_rosters(rosters, next_id, rng)
+            new_ids = np.arange(next_id, start_id)
+            profiles = pd.concat([profiles, player_profiles(new_ids, rng)])
+            next_id = start_id
+
+        games = season_schedule(teams, season, rng)
+        box = season_boxscores(games, teams, rosters, profiles, rng)
+
+        games.to_sql("games", con, if_exists="append", index=False)
+        box.to_sql("boxscores", con, if_exists="append", index=False, chunksize=50_000)
+        con.commit()
+
+        n_games += len(games)
+        n_rows += len(box)
+        print(f"Season {season}-{(season + 1) % 100:02d}: {len(games)} games, {len(box)} boxscore rows")
+
+    con.close()
+    return {"seasons": seasons, "games": n_games, "boxscores": n_rows}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate synthetic NBA seasons into SQLite.")
+    parser.add_argument("--seasons", type=int, default=1)
+    parser.add_argument("--db", default=str(BASE_DIR / "data" / "synthetic.db"))
+    parser.add_argument("--first-season", type=int, help="Starting year of the first season")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate(args.db, args.seasons, args.first_season, args.seed)